@@ -1,5 +1,9 @@
-from langchain_experimental.agents import create_csv_agent
+from langchain_experimental.agents import create_pandas_dataframe_agent
 from langchain.chat_models import ChatOpenAI
+from collections import OrderedDict
+import pandas as pd
+import threading
+import re
 import os
 
 # ✅ تأكد أن توكنك محفوظ في environment variable أو اكتبه هنا مؤقتًا
@@ -8,18 +12,78 @@ OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY") or "sk-xxx"  # استبدله
 # ✅ مسار ملف CSV (يفضل يكون ثابت داخل مجلد data)
 CSV_PATH = os.path.join("data", "matches.csv")
 
+# ✅ عدد الإجابات المحفوظة (Answer cache size)
+ANSWER_CACHE_SIZE = int(os.environ.get("CSV_ANSWER_CACHE_SIZE", 256))
+
+_lock = threading.Lock()
+_llm = None
+_df = None
+_df_version = None
+_answers = OrderedDict()
+
+
+def csv_version(path=CSV_PATH):
+    """Changes whenever the CSV is rewritten: (modification time, size)."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_llm():
+    global _llm
+    if _llm is None:
+        _llm = ChatOpenAI(
+            temperature=0.3,
+            model="gpt-4-turbo",
+            openai_api_key=OPENAI_API_KEY
+        )
+    return _llm
+
+
+def get_dataframe():
+    """The CSV contents, read once and re-read only when the file changes. Treat as read-only."""
+    global _df, _df_version
+    version = csv_version()
+    with _lock:
+        if _df is None or _df_version != version:
+            # create_csv_agent would re-read the file on every call; read it once here instead
+            _df = pd.read_csv(CSV_PATH)
+            _df_version = version
+            for key in [key for key in _answers if key[1] != version]:
+                del _answers[key]
+            print(f"✅ CSV loaded: {CSV_PATH} ({len(_df)} rows)")
+        return _df
+
+
 def get_agent():
-    llm = ChatOpenAI(
-        temperature=0.3,
-        model="gpt-4-turbo",
-        openai_api_key=OPENAI_API_KEY
-    )
+    """A CSV agent over its own copy of the cached dataframe.
 
-    agent = create_csv_agent(
-        llm=llm,
-        path=CSV_PATH,
+    The agent runs generated pandas code, which may modify the frame in
+    place; a copy per run keeps that from leaking into later questions.
+    """
+    return create_pandas_dataframe_agent(
+        get_llm(),
+        get_dataframe().copy(),
         verbose=True,
         allow_dangerous_code=True  # يسمح له يشغل كود تحليل
     )
 
-    return agent
+
+def normalize_question(question):
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!.؟ ").lower()
+
+
+def ask(question):
+    """Answer a question about the CSV, reusing earlier answers for the same question and CSV version."""
+    key = (normalize_question(question), csv_version())
+    with _lock:
+        if key in _answers:
+            _answers.move_to_end(key)
+            return _answers[key]
+
+    answer = get_agent().run(question)
+
+    with _lock:
+        _answers[key] = answer
+        while len(_answers) > ANSWER_CACHE_SIZE:
+            _answers.popitem(last=False)
+    return answer
@@ -1,13 +1,16 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
 import os
-from datetime import datetime
-import shutil
-
-from transcribe import transcribe_audio
-from generate_tts import generate_tts
-from generate_lipsync import generate_lipsync
-from backend.agent_utils import get_agent  # ✅ مضاف لتحليل CSV
+import json
+import base64
+from werkzeug.utils import safe_join
+
+from transcribe import transcribe_audio, warm_up as warm_up_asr
+from generate_tts import generate_tts, synthesize, stream_tts, VOICE, AUDIO_MIME
+from generate_lipsync import generate_lipsync, lipsync_cues, RHUBARB_OPTIONS
+from speech_cache import SpeechCache
+from jobs import queues, get_job, QueueFull
+from backend.agent_utils import ask  # ✅ مضاف لتحليل CSV
 from langchain.chat_models import ChatOpenAI  # ✅ GPT
 
 app = Flask(__name__)
@@ -15,6 +18,11 @@ CORS(app)
 
 UPLOAD_FOLDER = "temp"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+JOB_WAIT_TIMEOUT = float(os.environ.get("JOB_WAIT_TIMEOUT", 60))  # seconds a request waits before answering 202
+speech_cache = SpeechCache()
+# "words": mouth cues from TTS word timings; "rhubarb": slower, higher quality cues from the audio
+LIPSYNC_MODE = os.environ.get("LIPSYNC_MODE", "words")
+LIPSYNC_OPTIONS = RHUBARB_OPTIONS if LIPSYNC_MODE == "rhubarb" else ["word-boundary"]
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY") or "sk-xxx"  # ضع توكنك هنا
 
@@ -39,13 +47,87 @@ def ask_csv():
     question = data.get('question', '')
 
     try:
-        agent = get_agent()
-        response = agent.run(question)
+        response = ask(question)  # ✅ Cached dataframe and answers
         return jsonify({"response": response})
     except Exception as e:
         print("❌ CSV Agent Error:", e)
         return jsonify({"response": "⚠️ Failed to answer."}), 500
 
+# ✅ Run a job on a stage queue; wait for it unless the client asked for async
+def run_job(stage, fn, *args):
+    data = request.get_json(silent=True) or {}
+    try:
+        job = queues[stage].submit(fn, *args)
+    except QueueFull as e:
+        print("❌ Queue full:", e)
+        return jsonify({"error": "Server busy, try again shortly"}), 503, {"Retry-After": "2"}
+
+    if data.get("async") or request.args.get("async"):
+        return jsonify(job.to_dict()), 202
+
+    job.done.wait(JOB_WAIT_TIMEOUT)
+    if job.status == "done":
+        return jsonify(job.result)
+    if job.status == "failed":
+        return jsonify({"error": f"Failed to run {stage} job", "job_id": job.id}), 500
+    return jsonify(job.to_dict()), 202
+
+def temp_url(path):
+    return "/temp/" + os.path.relpath(path, UPLOAD_FOLDER).replace(os.sep, "/")
+
+def transcribe_job(job, audio_bytes):
+    def on_partial(text):
+        job.partial = {"text": text}  # ✅ Shown by /api/jobs/<id> while long recordings are transcribed
+    return {"text": transcribe_audio(audio_bytes, on_partial), "job_id": job.id}
+
+def tts_result(wav_path, **extra):
+    # filename stays relative to /temp so /api/lipsync and the avatar find both files
+    return {"audio_path": temp_url(wav_path), "filename": temp_url(wav_path)[len("/temp/"):], **extra}
+
+def lipsync_result(json_path, wav_path, **extra):
+    return {"json_path": temp_url(json_path), "audio_path": temp_url(wav_path), **extra}
+
+def tts_job(job, text, key):
+    if LIPSYNC_MODE == "rhubarb":
+        with speech_cache.writing(key, speech_cache.AUDIO) as tmp_path:
+            generate_tts(text, tmp_path)
+    else:
+        # ✅ Mouth cues come from edge-tts word timings, so /api/lipsync is a cache hit
+        with speech_cache.writing(key, speech_cache.AUDIO) as tmp_path, \
+                speech_cache.writing(key, speech_cache.CUES) as tmp_cues_path:
+            generate_tts(text, tmp_path, cues_path=tmp_cues_path)
+    return tts_result(speech_cache.path(key, speech_cache.AUDIO), job_id=job.id)
+
+def lipsync_job(job, wav_path):
+    key = speech_cache.entry_of(wav_path)
+    if key is None:
+        output_json_path = generate_lipsync(wav_path)
+    else:
+        with speech_cache.writing(key, speech_cache.CUES) as tmp_path:
+            generate_lipsync(wav_path, tmp_path)
+        output_json_path = speech_cache.path(key, speech_cache.CUES)
+    return lipsync_result(output_json_path, wav_path, job_id=job.id)
+
+def speak_result(key, audio, cues, **extra):
+    wav_path = speech_cache.path(key, speech_cache.AUDIO)
+    return {
+        "audio": base64.b64encode(audio).decode("ascii"),
+        "audio_mime": AUDIO_MIME,
+        "lipsync": cues,
+        **tts_result(wav_path),
+        "json_path": temp_url(speech_cache.path(key, speech_cache.CUES)),
+        **extra,
+    }
+
+def speak_job(job, text, key):
+    audio, cues = synthesize(text, VOICE)
+    if cues is None or LIPSYNC_MODE == "rhubarb":
+        cues = lipsync_cues(audio)
+    # ✅ Keep both in the speech cache so the next request (or /temp) can reuse them
+    speech_cache.put(key, speech_cache.CUES, json.dumps(cues).encode("utf-8"))
+    speech_cache.put(key, speech_cache.AUDIO, audio)
+    return speak_result(key, audio, cues, job_id=job.id)
+
 # ✅ Convert audio to text
 @app.route("/api/audio", methods=["POST"])
 def audio_to_text():
@@ -53,18 +135,9 @@ def audio_to_text():
         return jsonify({"error": "No audio file provided"}), 400
 
     audio = request.files["audio"]
-    filename = f"recording_{int(datetime.now().timestamp())}.webm"
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
-    audio.save(file_path)
-
-    try:
-        text = transcribe_audio(file_path)
-        return jsonify({"text": text, "filename": filename})
-    except Exception as e:
-        print("❌ Audio Error:", e)
-        return jsonify({"error": "Failed to transcribe audio"}), 500
+    return run_job("audio", transcribe_job, audio.read())
 
-# ✅ Generate TTS and save as a fixed name
+# ✅ Generate TTS, or serve it from the speech cache
 @app.route('/api/tts', methods=['POST'])
 def tts():
     data = request.get_json()
@@ -72,16 +145,28 @@ def tts():
     if not text:
         return jsonify({"error": "Text is missing"}), 400
 
-    current_wav = os.path.join(UPLOAD_FOLDER, "current.wav")
+    key = SpeechCache.key(text, VOICE, LIPSYNC_OPTIONS)
+    cached_wav = speech_cache.get(key, speech_cache.AUDIO)
+    if cached_wav:
+        return jsonify(tts_result(cached_wav, cached=True))
 
-    try:
-        generate_tts(text, current_wav)
-        return jsonify({"audio_path": "/temp/current.wav", "filename": "current.wav"})
-    except Exception as e:
-        print("❌ TTS Error:", e)
-        return jsonify({"error": "Failed to generate audio"}), 500
+    return run_job("tts", tts_job, text, key)
 
-# ✅ Generate lipsync and save as current.json
+# ✅ Stream TTS audio as it is synthesized (chunked MP3), sentence by sentence
+@app.route('/api/tts/stream', methods=['POST'])
+def tts_stream():
+    data = request.get_json()
+    text = data.get('text', '')
+    if not text.strip():  # ✅ Must fail before the 200 headers of the stream go out
+        return jsonify({"error": "Text is missing"}), 400
+
+    cached_wav = speech_cache.get(SpeechCache.key(text, VOICE, LIPSYNC_OPTIONS), speech_cache.AUDIO)
+    if cached_wav:
+        return send_from_directory(os.path.dirname(os.path.abspath(cached_wav)), speech_cache.AUDIO, mimetype=AUDIO_MIME)
+
+    return Response(stream_with_context(stream_tts(text, VOICE)), mimetype=AUDIO_MIME)
+
+# ✅ Generate lipsync next to the given TTS audio (cached with it)
 @app.route('/api/lipsync', methods=['POST'])
 def lipsync():
     data = request.get_json()
@@ -89,22 +174,44 @@ def lipsync():
     if not wav_filename:
         return jsonify({"error": "Audio filename is missing"}), 400
 
-    wav_path = os.path.join(UPLOAD_FOLDER, wav_filename)
+    wav_path = safe_join(UPLOAD_FOLDER, wav_filename)
+    if wav_path is None or not os.path.isfile(wav_path):
+        return jsonify({"error": "Audio file not found"}), 404
 
-    try:
-        output_json_path = generate_lipsync(wav_path)
-        target_path = os.path.join(UPLOAD_FOLDER, "current.json")
+    key = speech_cache.entry_of(wav_path)
+    cached_json = key and speech_cache.get(key, speech_cache.CUES)
+    if cached_json:
+        return jsonify(lipsync_result(cached_json, wav_path, cached=True))
 
-        if os.path.abspath(output_json_path) != os.path.abspath(target_path):
-            shutil.copy(output_json_path, target_path)
+    return run_job("lipsync", lipsync_job, wav_path)
 
-        return jsonify({
-            "json_path": "/temp/current.json",
-            "audio_path": "/temp/current.wav"
-        })
-    except Exception as e:
-        print("❌ Lipsync Error:", e)
-        return jsonify({"error": "Failed to generate lipsync"}), 500
+# ✅ TTS and lipsync in one call: audio (base64) and mouth cues together
+@app.route('/api/speak', methods=['POST'])
+def speak():
+    data = request.get_json()
+    text = data.get('text', '')
+    if not text:
+        return jsonify({"error": "Text is missing"}), 400
+
+    key = SpeechCache.key(text, VOICE, LIPSYNC_OPTIONS)
+    cached_wav = speech_cache.get(key, speech_cache.AUDIO)
+    cached_json = speech_cache.get(key, speech_cache.CUES)
+    if cached_wav and cached_json:
+        with open(cached_wav, "rb") as f:
+            audio = f.read()
+        with open(cached_json, encoding="utf-8") as f:
+            cues = json.load(f)
+        return jsonify(speak_result(key, audio, cues, cached=True))
+
+    return run_job("tts", speak_job, text, key)
+
+# ✅ Job status and result
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
 
 # ✅ Serve static files from /temp
 @app.route('/temp/<path:filename>')
@@ -113,4 +220,6 @@ def serve_temp_file(filename):
 
 # ✅ Run the Flask server
 if __name__ == '__main__':
+    if os.environ.get("ASR_WARM_UP"):
+        warm_up_asr()  # ✅ Load the ASR model before the first request instead of on it
     app.run(debug=True, port=5000)
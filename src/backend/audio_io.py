@@ -0,0 +1,46 @@
+import io
+import os
+import shutil
+import subprocess
+import wave
+
+import numpy as np
+
+# ffmpeg from FFMPEG_BINARY or the PATH; no platform-specific binary paths
+FFMPEG = os.environ.get("FFMPEG_BINARY") or shutil.which("ffmpeg") or "ffmpeg"
+
+
+def _ffmpeg(source, output_args):
+    """Run ffmpeg on a path or raw bytes and return what it writes to stdout."""
+    from_memory = isinstance(source, (bytes, bytearray, memoryview))
+    command = [FFMPEG, "-hide_banner", "-loglevel", "error", "-i", "pipe:0" if from_memory else os.fspath(source)]
+    result = subprocess.run(command + output_args + ["pipe:1"],
+                            input=bytes(source) if from_memory else None,
+                            stdin=None if from_memory else subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"❌ ffmpeg failed: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
+
+
+def decode_audio(source, sample_rate=16000):
+    """Decode any ffmpeg-readable audio (path or bytes) to a mono float32 array at ``sample_rate``."""
+    pcm = _ffmpeg(source, ["-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(sample_rate)])
+    return np.frombuffer(pcm, dtype=np.float32)
+
+
+def to_wav_bytes(source, sample_rate=44100):
+    """Re-encode audio (path or bytes) as 16-bit PCM mono WAV bytes at ``sample_rate``."""
+    pcm = _ffmpeg(source, ["-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(sample_rate)])
+    return pcm_to_wav(pcm, sample_rate)
+
+
+def pcm_to_wav(pcm, sample_rate, channels=1):
+    """Wrap raw 16-bit PCM in a WAV header, in memory."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
@@ -1,32 +1,45 @@
 import subprocess
+import shutil
+import json
 import os
+import tempfile
 
-def generate_lipsync(input_audio_path):
-    temp_dir = os.path.dirname(input_audio_path)
-    
-    # ✅ Save the temporary audio under a different name
-    fixed_audio_path = input_audio_path.replace(".wav", "_converted.wav")
-    output_json_path = input_audio_path.replace(".wav", ".json")
-
-    # ✅ Relative path to rhubarb based on the updated structure
-    rhubarb_path = os.path.join(os.path.dirname(__file__), "bin", "rhubarb.exe")
-
-    # ✅ Convert to PCM WAV
-    subprocess.run([
-        "ffmpeg", "-y",
-        "-i", input_audio_path,
-        "-acodec", "pcm_s16le",
-        "-ar", "44100",
-        fixed_audio_path
-    ], check=True)
-
-    # ✅ Generate lipsync
-    subprocess.run([
-        rhubarb_path,
-        "-r", "phonetic",
-        "-f", "json",
-        "-o", output_json_path,
-        fixed_audio_path
-    ], check=True)
+from audio_io import to_wav_bytes
+
+# ✅ rhubarb from RHUBARB_BINARY, the PATH, or the bundled Windows build
+RHUBARB = (os.environ.get("RHUBARB_BINARY") or shutil.which("rhubarb")
+           or os.path.join(os.path.dirname(__file__), "bin", "rhubarb.exe"))
+
+RHUBARB_OPTIONS = ["-r", "phonetic"]
+
+def generate_lipsync(input_audio_path, output_json_path=None):
+    output_json_path = output_json_path or input_audio_path.replace(".wav", ".json")
+
+    cues = lipsync_cues(input_audio_path)
+    with open(output_json_path, "w", encoding="utf-8") as f:
+        json.dump(cues, f, indent=2)
 
     return output_json_path
+
+def lipsync_cues(audio):
+    """Rhubarb mouth cues for audio given as a path or bytes."""
+    # ✅ Convert to 44.1kHz PCM WAV through an ffmpeg pipe
+    wav_bytes = to_wav_bytes(audio, 44100)
+
+    # ✅ rhubarb only reads files, so hand it one short-lived copy
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
+        f.write(wav_bytes)
+        fixed_audio_path = f.name
+
+    try:
+        # ✅ Generate lipsync, read back from stdout
+        result = subprocess.run([
+            RHUBARB,
+            *RHUBARB_OPTIONS,
+            "-f", "json",
+            fixed_audio_path
+        ], check=True, stdout=subprocess.PIPE)
+    finally:
+        os.remove(fixed_audio_path)
+
+    return json.loads(result.stdout)
@@ -1,25 +1,150 @@
 import edge_tts
 import asyncio
+import inspect
+import json
 import os
+import queue
+import re
+import threading
 
-def generate_tts(text, output_path="temp/current.wav"):
+from visemes import cues_from_word_boundaries
+
+VOICE = "en-US-GuyNeural"  # ✅ Male American voice
+AUDIO_BITRATE = 48000  # edge-tts default output: 24kHz 48kbit/s mono MP3
+AUDIO_MIME = "audio/mpeg"
+STREAM_PREFETCH = 2  # sentences synthesized ahead of the one being streamed
+SENTENCE_MIN_CHARS = 40  # shorter sentences are joined with the next one
+TTS_CONCURRENCY = int(os.environ.get("TTS_CONCURRENCY", 4))  # syntheses running at once; the rest wait
+
+
+class TTSLoop:
+    """A long-lived event loop thread that runs every edge-tts call of the process.
+
+    Flask handlers hand it coroutines with ``submit``/``run`` (thread safe)
+    instead of paying for ``asyncio.run`` per request. At most
+    ``concurrency`` syntheses talk to the service at once. When edge-tts
+    accepts a ``connector`` (7.x), they share one aiohttp connector, so DNS
+    lookups are cached across syntheses; each one still opens its own
+    websocket, with its own TLS handshake. Older edge-tts versions build
+    their own connector per synthesis.
+    """
+
+    def __init__(self, concurrency=TTS_CONCURRENCY):
+        self.concurrency = concurrency
+        self.loop = None
+        self.semaphore = None
+        self.connector = None
+        self.communicate_kwargs = {}
+        self.lock = threading.Lock()
+
+    def _start(self):
+        with self.lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="tts-loop", daemon=True).start()
+                try:
+                    asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+                except Exception:
+                    loop.call_soon_threadsafe(loop.stop)
+                    raise
+                self.loop = loop
+        return self.loop
+
+    async def _setup(self):
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        parameters = inspect.signature(edge_tts.Communicate).parameters
+        if "boundary" in parameters:
+            # edge-tts 7 reports sentence boundaries unless asked for words; the mouth cues need words
+            self.communicate_kwargs["boundary"] = "WordBoundary"
+        if "connector" in parameters:
+            import aiohttp
+
+            class SharedConnector(aiohttp.TCPConnector):
+                # edge-tts closes its session after every utterance; keep the pool alive
+                async def close(self):
+                    pass
+
+            self.connector = SharedConnector(ttl_dns_cache=300)
+            self.communicate_kwargs["connector"] = self.connector
+
+    def submit(self, coro):
+        """Schedule ``coro`` on the loop from any thread; returns a ``concurrent.futures.Future``."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop or self._start())
+
+    def run(self, coro, timeout=None):
+        return self.submit(coro).result(timeout)
+
+    async def stream(self, text, voice=VOICE):
+        """edge-tts messages for ``text``, holding one concurrency slot while they arrive."""
+        async with self.semaphore:
+            communicate = edge_tts.Communicate(text=text, voice=voice, **self.communicate_kwargs)
+            async for message in communicate.stream():
+                yield message
+
+
+tts_loop = TTSLoop()
+
+def generate_tts(text, output_path="temp/current.wav", voice=VOICE, cues_path=None):
+    """Synthesize ``text`` to ``output_path``.
+
+    With ``cues_path``, also write rhubarb-style mouth cues built from the
+    word timings edge-tts reports while synthesizing (skipped if it sent none).
+    """
+    if not text.strip():
+        raise ValueError("❌ Cannot convert empty text to speech")
+
+    try:
+        tts_loop.run(generate_tts_async(text, output_path, voice, cues_path))
+    except Exception as e:
+        print("❌ TTS sync error:", e)
+        raise e
+
+
+def synthesize(text, voice=VOICE):
+    """Synthesize ``text`` in memory: returns ``(audio_bytes, mouth_cues)``; cues are None without word timings."""
     if not text.strip():
         raise ValueError("❌ Cannot convert empty text to speech")
 
     try:
-        asyncio.run(generate_tts_async(text, output_path))
+        return tts_loop.run(synthesize_async(text, voice))
     except Exception as e:
         print("❌ TTS sync error:", e)
         raise e
 
 
-async def generate_tts_async(text, output_path):
+async def synthesize_async(text, voice=VOICE):
+    chunks = []
+    boundaries = []
+    async for message in tts_loop.stream(text, voice):
+        if message["type"] == "audio":
+            chunks.append(message["data"])
+        elif message["type"] == "WordBoundary":
+            boundaries.append(message)
+    audio = b"".join(chunks)
+    if not audio:
+        raise ValueError("❌ No audio was received.")
+    cues = cues_from_word_boundaries(boundaries, len(audio) * 8 / AUDIO_BITRATE) if boundaries else None
+    return audio, cues
+
+
+async def generate_tts_async(text, output_path, voice=VOICE, cues_path=None):
     try:
-        communicate = edge_tts.Communicate(
-            text=text,
-            voice="en-US-GuyNeural"  # ✅ Male American voice
-        )
-        await communicate.save(output_path)
+        if cues_path is None:
+            with open(output_path, "wb") as f:
+                async for message in tts_loop.stream(text, voice):
+                    if message["type"] == "audio":
+                        f.write(message["data"])
+        else:
+            audio, cues = await synthesize_async(text, voice)
+            with open(output_path, "wb") as f:
+                f.write(audio)
+            if cues:
+                cues["metadata"]["soundFile"] = os.path.basename(output_path)
+                with open(cues_path, "w", encoding="utf-8") as f:
+                    json.dump(cues, f, indent=2)
+                print("✅ Mouth cues saved from word timings:", cues_path)
+            else:
+                print("⚠️ No word timings received, mouth cues left to rhubarb")
         print("✅ Audio saved successfully:", output_path)
 
         if not os.path.exists(output_path):
@@ -28,3 +153,92 @@ async def generate_tts_async(text, output_path):
     except Exception as e:
         print("❌ TTS async error:", e)
         raise e
+
+
+def split_sentences(text, min_chars=SENTENCE_MIN_CHARS):
+    """Split a reply at sentence ends, joining short sentences so each request is worth its round trip."""
+    sentences = []
+    for sentence in re.split(r"(?<=[.!?؟])\s+", text.strip()):
+        if sentences and len(sentences[-1]) < min_chars:
+            sentences[-1] = f"{sentences[-1]} {sentence}"
+        elif sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+async def stream_tts_async(text, voice=VOICE, prefetch=STREAM_PREFETCH):
+    """Yield MP3 chunks for ``text`` as edge-tts produces them, sentence by sentence.
+
+    Up to ``prefetch`` later sentences are synthesized while the current
+    one streams; their chunks are buffered and yielded in order.
+    """
+    sentences = split_sentences(text)
+    limit = asyncio.Semaphore(prefetch + 1)
+    buffers = [asyncio.Queue() for _ in sentences]
+
+    async def produce(sentence, buffer):
+        async with limit:
+            try:
+                async for message in tts_loop.stream(sentence, voice):
+                    if message["type"] == "audio":
+                        buffer.put_nowait(message["data"])
+            except Exception as e:
+                buffer.put_nowait(e)
+            finally:
+                buffer.put_nowait(None)
+
+    tasks = [asyncio.create_task(produce(sentence, buffer)) for sentence, buffer in zip(sentences, buffers)]
+    try:
+        for buffer in buffers:
+            while (chunk := await buffer.get()) is not None:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def stream_tts(text, voice=VOICE, max_buffered=64):
+    """Blocking iterator over ``stream_tts_async`` (run on ``tts_loop``) for Flask responses; closing it stops synthesis.
+
+    Empty text raises here, when called, rather than on the first ``next``.
+    """
+    if not text.strip():
+        raise ValueError("❌ Cannot convert empty text to speech")
+    return _stream_tts(text, voice, max_buffered)
+
+
+def _stream_tts(text, voice, max_buffered):
+    chunks = queue.Queue(max_buffered)
+    stop = threading.Event()
+
+    async def offer(item):
+        # Wait for room without blocking the event loop; give up once the reader is gone
+        while not stop.is_set():
+            try:
+                chunks.put_nowait(item)
+                return True
+            except queue.Full:
+                await asyncio.sleep(0.01)
+        return False
+
+    async def pump():
+        try:
+            async for chunk in stream_tts_async(text, voice):
+                if not await offer(chunk):
+                    return
+        except Exception as e:
+            print("❌ TTS stream error:", e)
+            await offer(e)
+            return
+        await offer(None)
+
+    tts_loop.submit(pump())
+    try:
+        while (chunk := chunks.get()) is not None:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        stop.set()
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_TTL = 3600  # seconds a finished job is kept
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, stage):
+        self.id = uuid.uuid4().hex
+        self.stage = stage
+        self.status = "queued"
+        self.result = None
+        self.partial = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        info = {"job_id": self.id, "stage": self.stage, "status": self.status}
+        if self.status == "done":
+            info["result"] = self.result
+        elif self.status == "failed":
+            info["error"] = self.error
+        if self.status != "done" and self.partial is not None:
+            info["partial"] = self.partial
+        return info
+
+
+class JobQueue:
+    """A bounded worker pool for one stage (ASR, TTS, lipsync).
+
+    At most ``workers`` jobs run at once and at most ``max_pending`` more
+    wait for a worker; ``submit`` raises ``QueueFull`` beyond that instead
+    of letting requests pile up.
+    """
+
+    def __init__(self, stage, workers=2, max_pending=8):
+        self.stage = stage
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=stage)
+        self.slots = threading.BoundedSemaphore(workers + max_pending)
+
+    def submit(self, fn, *args):
+        """Run ``fn(job, *args)`` on the pool; its return value becomes the job result."""
+        if not self.slots.acquire(blocking=False):
+            raise QueueFull(f"{self.stage} queue is full")
+        prune()
+        job = Job(self.stage)
+        with _lock:
+            _jobs[job.id] = job
+        self.executor.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job, fn, args):
+        job.status = "running"
+        try:
+            job.result = fn(job, *args)
+            job.status = "done"
+        except Exception as e:
+            print(f"❌ {self.stage} job {job.id} failed:", e)
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+            self.slots.release()
+            job.done.set()
+
+
+_jobs = {}
+_lock = threading.Lock()
+
+
+def get_job(job_id):
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def prune(ttl=JOB_TTL):
+    """Forget finished jobs older than ``ttl`` seconds."""
+    cutoff = time.time() - ttl
+    with _lock:
+        expired = [job for job in _jobs.values() if job.finished and job.finished < cutoff]
+        for job in expired:
+            del _jobs[job.id]
+
+
+queues = {
+    "audio": JobQueue("audio", int(os.environ.get("ASR_WORKERS", 4)), int(os.environ.get("ASR_MAX_PENDING", 8))),
+    "tts": JobQueue("tts", int(os.environ.get("TTS_WORKERS", 4)), int(os.environ.get("TTS_MAX_PENDING", 16))),
+    "lipsync": JobQueue("lipsync", int(os.environ.get("LIPSYNC_WORKERS", 2)), int(os.environ.get("LIPSYNC_MAX_PENDING", 8))),
+}
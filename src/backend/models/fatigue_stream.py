@@ -0,0 +1,155 @@
+from collections import deque
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from process_module import FatigueProcessor, impute, parse_percent
+
+ROLLING = FatigueProcessor.ROLLING_FEATURES
+AVG5_FEATURES = [f'{col}_avg5' for col in ROLLING if f'{col}_avg5' not in FatigueProcessor.DROPPED_COLS]
+FEATURES = AVG5_FEATURES + FatigueProcessor.STATE_FEATURES + ['position']
+GROUP_STATS = ['passes_per_min', 'duels_per_min', 'passes_accuracy']
+# Stats that describe the match so far rather than accumulate over it
+ABSOLUTE_STATS = {'games_minutes', 'passes_accuracy'}
+
+
+def _group_stats(record):
+    minutes = record['games_minutes'] or 1
+    return np.array([record['passes_total'] / minutes, record['duels_total'] / minutes, record['passes_accuracy']])
+
+
+class FatigueStream:
+    """In-play fatigue state for the players on the pitch.
+
+    Keeps each player's last five finished matches and running per-position
+    totals, so in-match updates never touch the historical CSV. Players are
+    started with ``start``, fed stat deltas with ``update`` every few
+    minutes, scored together with ``predict`` and folded into their history
+    with ``finish``. Features match ``FatigueProcessor``'s model columns,
+    with the 5-match averages taken over each player's own history.
+    """
+
+    def __init__(self, positions=(), window=5):
+        self.window = window
+        self.positions = {position: code for code, position in enumerate(sorted(positions))}
+        self.history = {}
+        self.player_position = {}
+        self.position_totals = {}
+        self.live = {}
+
+    @classmethod
+    def from_history(cls, path, processor=None, window=5):
+        """Seed the state from a player CSV once; only compact per-player state is kept."""
+        processor = processor or FatigueProcessor()
+        df = impute(processor.read(path), zero_cols=processor.zero_fill_cols)
+        df = df.dropna(subset=['games_number'])
+        df['passes_accuracy'] = parse_percent(df['passes_accuracy']) / 100
+        df = df.sort_values(by=['player_id', 'fixture_id'])
+
+        stream = cls(df['games_position'].dropna().unique() if 'games_position' in df.columns else (), window)
+        for player_id, record in zip(df['player_id'].to_numpy(), df[ROLLING].to_dict('records')):
+            stream._remember(player_id, record)
+        if 'games_position' in df.columns:
+            last = df.dropna(subset=['games_position']).groupby('player_id')['games_position'].last()
+            stream.player_position.update(last.astype(str).to_dict())
+            minutes = df['games_minutes'].replace(0, 1)
+            per_position = pd.DataFrame({
+                'position': df['games_position'].astype(str),
+                'passes_per_min': df['passes_total'] / minutes,
+                'duels_per_min': df['duels_total'] / minutes,
+                'passes_accuracy': df['passes_accuracy'],
+            }).groupby('position')[GROUP_STATS].agg(['sum', 'count'])
+            for position, row in per_position.iterrows():
+                stream.position_totals[position] = [
+                    np.array([row[(stat, 'sum')] for stat in GROUP_STATS]), row[(GROUP_STATS[0], 'count')]]
+        return stream
+
+    def _remember(self, player_id, record):
+        history = self.history.get(player_id)
+        if history is None:
+            history = self.history[player_id] = deque(maxlen=self.window)
+        history.append(np.array([record[col] for col in ROLLING], dtype=float))
+
+    def start(self, player_id, position=None):
+        """Put a player on the pitch with an empty stat line."""
+        if position is not None:
+            self.player_position[player_id] = position
+        self.live[player_id] = dict.fromkeys(ROLLING, 0.0)
+
+    def update(self, player_id, **stats):
+        """Apply a stat delta, e.g. ``update(7, games_minutes=65, passes_total=4, passes_accuracy='81%')``.
+
+        ``games_minutes`` and ``passes_accuracy`` are current values; every
+        other stat is added to the match total.
+        """
+        if player_id not in self.live:
+            self.start(player_id)
+        record = self.live[player_id]
+        for col, value in stats.items():
+            if col == 'passes_accuracy':
+                record[col] = float(str(value).replace('%', '')) / 100
+            elif col in ABSOLUTE_STATS:
+                record[col] = float(value)
+            else:
+                record[col] = record.get(col, 0.0) + float(value)
+
+    def features(self, player_ids=None):
+        """Model features for the given (default: all on-pitch) players, indexed by player id."""
+        player_ids = list(self.live) if player_ids is None else list(player_ids)
+        rows = []
+        for player_id in player_ids:
+            current = self.live[player_id]
+            past = np.array(self.history.get(player_id, ()), dtype=float).reshape(-1, len(ROLLING))
+            with np.errstate(invalid='ignore'):
+                avg5 = dict(zip(ROLLING, past.mean(axis=0) if len(past) else np.full(len(ROLLING), np.nan)))
+            row = {f'{col}_avg5': avg5[col] for col in ROLLING}
+            row['passes_drop_ratio'] = current['passes_total'] / (avg5['passes_total'] + 1e-5)
+            row['duels_drop_ratio'] = current['duels_total'] / (avg5['duels_total'] + 1e-5)
+            row['accuracy_drop_ratio'] = current['passes_accuracy'] / (avg5['passes_accuracy'] + 1e-5)
+            # rolling(3) trend: current value minus the oldest value in [two matches ago, last match, now]
+            for col, name in [('passes_total', 'passes_trend'), ('duels_total', 'duels_trend'),
+                              ('passes_accuracy', 'accuracy_trend')]:
+                earlier = past[-2:, ROLLING.index(col)]
+                row[name] = current[col] - (earlier[0] if len(earlier) else current[col])
+            row['passes_accuracy'] = current['passes_accuracy']
+            row['position'] = self.positions.get(self.player_position.get(player_id), np.nan)
+            row.update(self._versus_group(player_id, current))
+            rows.append(row)
+        return pd.DataFrame(rows, index=pd.Index(player_ids, name='player_id'),
+                            columns=FEATURES + ['passes_vs_group', 'duels_vs_group'])
+
+    def _versus_group(self, player_id, current):
+        totals = self.position_totals.get(self.player_position.get(player_id))
+        if not totals or not totals[1]:
+            return {'passes_vs_group': np.nan, 'duels_vs_group': np.nan}
+        group_mean = totals[0] / totals[1]
+        stats = _group_stats(current)
+        return {'passes_vs_group': stats[0] / (group_mean[0] + 1e-5),
+                'duels_vs_group': stats[1] / (group_mean[1] + 1e-5)}
+
+    def predict(self, predictor, player_ids=None):
+        """Fatigue probability for every on-pitch player from a single ``predict_proba`` call."""
+        features = self.features(player_ids)
+        if features.empty:
+            return pd.Series(dtype=float, name='fatigue_probability')
+        probs = predictor.predict_proba(features[FEATURES])
+        return probs[1].rename('fatigue_probability')
+
+    def finish(self, player_ids=None):
+        """Close the match for these (default: all) players and add it to their history."""
+        for player_id in list(self.live) if player_ids is None else list(player_ids):
+            record = self.live.pop(player_id)
+            self._remember(player_id, record)
+            position = self.player_position.get(player_id)
+            if position is not None:
+                totals = self.position_totals.setdefault(position, [np.zeros(len(GROUP_STATS)), 0])
+                totals[0] = totals[0] + _group_stats(record)
+                totals[1] += 1
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from pandas.api.types import union_categoricals
+
+
+EXECUTION_PARAMS = {'workers'}  # change how a frame is built, not what it holds
+
+
+def _params(processor):
+    params = {}
+    for name, value in sorted(vars(processor).items()):
+        if name in EXECUTION_PARAMS:
+            continue
+        if isinstance(value, (int, float, str, bool, list, tuple)) or value is None:
+            params[name] = value
+    return params
+
+
+class FeatureStore:
+    """On-disk cache of processor outputs in uncompressed Feather (Arrow IPC) files.
+
+    Each entry belongs to one (source file, processor class, processor
+    ``VERSION``, processor parameters) combination and records the SHA-256
+    of the source it was built from. An unchanged source is served straight
+    from a memory-mapped file. For processors with ``PARTITION_COLS`` (``PreMatchProcessor``), a
+    source that only had rows appended is updated by rebuilding the touched
+    partitions and splicing them into the cached base frame.
+    """
+
+    def __init__(self, root="data/feature_store"):
+        self.root = root
+
+    def load_or_process(self, processor, path):
+        entry = self._entry_dir(processor, path)
+        meta = self._read_meta(entry)
+        size = os.path.getsize(path)
+        prefix_digest, digest = _file_digests(path, meta['size'] if meta else None)
+
+        if meta and meta['sha256'] == digest and os.path.exists(os.path.join(entry, 'features.feather')):
+            return self._read(entry, 'features')
+
+        partition_cols = getattr(processor, 'PARTITION_COLS', None)
+        appended = meta is not None and size > meta['size'] and prefix_digest == meta['sha256']
+        n_rows = base = None
+        if partition_cols:
+            raw = processor.read(path)
+            n_rows = len(raw)
+            if appended and meta.get('n_rows') is not None and os.path.exists(os.path.join(entry, 'base.feather')):
+                base = self._update_base(processor, raw, self._read(entry, 'base'), meta['n_rows'], partition_cols)
+            else:
+                base = processor.build_base(raw)
+            features = processor.finalize(base)
+        else:
+            features = processor.load_and_process(path)
+
+        os.makedirs(entry, exist_ok=True)
+        if base is not None:
+            self._write(entry, 'base', base)
+        self._write(entry, 'features', features)
+        self._write_meta(entry, {
+            'source': os.path.abspath(path),
+            'processor': type(processor).__name__,
+            'version': getattr(processor, 'VERSION', 0),
+            'params': _params(processor),
+            'sha256': digest,
+            'size': size,
+            'n_rows': n_rows,
+        })
+        return features
+
+    def load_base(self, processor, path):
+        """The cached ``build_base`` frame of a partitioned processor, rebuilt if the source changed."""
+        self.load_or_process(processor, path)
+        return self._read(self._entry_dir(processor, path), 'base')
+
+    def source_digest(self, processor, path):
+        """SHA-256 of the source the current entry was built from, or None without an entry."""
+        meta = self._read_meta(self._entry_dir(processor, path))
+        return meta['sha256'] if meta else None
+
+    def _update_base(self, processor, raw, base, n_rows, partition_cols):
+        touched = pd.MultiIndex.from_frame(raw.iloc[n_rows:][partition_cols].drop_duplicates())
+        in_touched = pd.MultiIndex.from_frame(raw[partition_cols]).isin(touched)
+        fresh = processor.build_base(raw[in_touched].copy())
+        kept = base[~pd.MultiIndex.from_frame(base[partition_cols]).isin(touched)].copy()
+        _unify_categories([kept, fresh])
+        merged = pd.concat([kept, fresh], ignore_index=True)
+        return merged.sort_values(partition_cols, kind='stable').reset_index(drop=True)
+
+    def _entry_dir(self, processor, path):
+        ident = json.dumps({
+            'source': os.path.abspath(path),
+            'processor': type(processor).__name__,
+            'version': getattr(processor, 'VERSION', 0),
+            'params': _params(processor),
+        }, sort_keys=True, default=str)
+        return os.path.join(self.root, hashlib.sha256(ident.encode()).hexdigest()[:16])
+
+    def _read_meta(self, entry):
+        meta_path = os.path.join(entry, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def _write_meta(self, entry, meta):
+        tmp_path = os.path.join(entry, 'meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, default=str)
+        os.replace(tmp_path, os.path.join(entry, 'meta.json'))
+
+    def _read(self, entry, name):
+        table = feather.read_table(os.path.join(entry, f'{name}.feather'), memory_map=True)
+        return table.to_pandas()
+
+    def _write(self, entry, name, df):
+        tmp_path = os.path.join(entry, f'{name}.feather.tmp')
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, os.path.join(entry, f'{name}.feather'))
+
+
+def _unify_categories(frames):
+    """Give each categorical column one dtype across ``frames``, so ``pd.concat`` keeps it categorical."""
+    for col in frames[0].columns:
+        if all(isinstance(frame[col].dtype, pd.CategoricalDtype) for frame in frames):
+            categories = union_categoricals([frame[col] for frame in frames], sort_categories=True).categories
+            for frame in frames:
+                frame[col] = frame[col].cat.set_categories(categories)
+
+
+def _file_digests(path, prefix_size=None, chunk_size=1 << 20):
+    """SHA-256 of the whole file and, in the same pass, of its first ``prefix_size`` bytes."""
+    full = hashlib.sha256()
+    prefix = hashlib.sha256() if prefix_size is not None else None
+    read = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            full.update(chunk)
+            if prefix is not None and read < prefix_size:
+                prefix.update(chunk[:prefix_size - read])
+            read += len(chunk)
+    return (prefix.hexdigest() if prefix is not None else None), full.hexdigest()
@@ -6,27 +6,37 @@ import matplotlib.pyplot as plt
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import confusion_matrix, ConfusionMatrixDisplay, classification_report
 from autogluon.tabular import TabularPredictor
-import joblib
 
 from process_module import (
     PreMatchProcessor,
     LiveMatchProcessor,
     FatigueProcessor,
-    compute_recent_form,
+    FormationIndex,
+    FormTracker,
+    TeamHistory,
     convert_to_team_level_live
 )
+from feature_store import FeatureStore
+from fatigue_stream import FatigueStream
+from model_registry import registry as default_registry
 
 
 
 class PreMatchModel:
-    def __init__(self, model_path="models/", data_path="data/merged_all_data_2016_2024.csv"):
+    def __init__(self, model_path="models/", data_path="data/merged_all_data_2016_2024.csv", feature_store=None, registry=None):
         self.model_path = model_path
         self.data_path = data_path
         self.processor = PreMatchProcessor()
+        self.feature_store = feature_store or FeatureStore()
+        self.registry = registry or default_registry
         self.predictor = None
+        self.history = None
+        self.history_digest = None
+        self.history_stat = None
 
     def train(self):
-        df = self.processor.load_and_process(self.data_path)
+        self.history = None
+        df = self.feature_store.load_or_process(self.processor, self.data_path)
         df = df.sort_values("date").reset_index(drop=True)
         train_data, test_data = train_test_split(df, test_size=0.2, shuffle=False)
 
@@ -77,26 +87,133 @@ class PreMatchModel:
         self.predictor.feature_importance(test_data)
 
     def load(self):
-        self.predictor = TabularPredictor.load(self.model_path)
+        self.predictor = self.registry.get(self.model_path, TabularPredictor.load)
+
+    def warm_up(self):
+        self.load()
 
     def predict(self, csv_path):
+        self.load()
+        # One-off inputs are processed directly; only the training data lives in the feature store
         df = self.processor.load_and_process(csv_path)
         X = df.drop(columns=["team_result"], errors='ignore')
         preds = self.predictor.predict(X)
         probs = self.predictor.predict_proba(X)
         return pd.concat([df[["fixture_id", "team_name", "opponent_name"]], preds, probs], axis=1)
 
+    def predict_fixture(self, home, away, date, league, season, home_formation='Unknown', away_formation='Unknown', fixture_id=None):
+        """Score one upcoming fixture from the indexed history in ``data_path``, without reprocessing it.
+
+        The index is rebuilt when ``data_path`` changes: a new mtime or size
+        triggers a store refresh, and a new source digest a new index.
+        """
+        self.load()
+        stat = os.stat(self.data_path)
+        if self.history is None or self.history_stat != (stat.st_mtime_ns, stat.st_size):
+            base = self.feature_store.load_base(self.processor, self.data_path)
+            digest = self.feature_store.source_digest(self.processor, self.data_path)
+            if self.history is None or self.history_digest != digest:
+                self.history = TeamHistory(base, self.processor.window)
+                self.history_digest = digest
+            self.history_stat = (stat.st_mtime_ns, stat.st_size)
+        df = self.history.features(home, away, date, league, season, home_formation, away_formation, fixture_id)
+        preds = self.predictor.predict(df)
+        probs = self.predictor.predict_proba(df)
+        return pd.concat([df[["fixture_id", "team_name", "opponent_name"]], preds, probs], axis=1)
+
 
 
 
 
 class LiveMatchModel:
-    def __init__(self, model_path="models/"):
+    ENCODERS = {
+        'team': "models/le_team.pkl",
+        'opponent': "models/le_opp.pkl",
+        'team_formation': "models/le_form_team.pkl",
+        'opponent_formation': "models/le_form_opp.pkl",
+    }
+    SCALER = "models/scaler.pkl"
+    FORMATION_INDEX = "models/formation_index.pkl"
+    FORM_TRACKER = "models/form_tracker.pkl"
+
+    def __init__(self, model_path="models/", registry=None):
         self.model_path = model_path
         self.processor = LiveMatchProcessor()
+        self.registry = registry or default_registry
         self.predictor = None
 
+    def warm_up(self):
+        self.registry.warm_up(list(self.ENCODERS.values()) + [self.SCALER, (self.model_path, TabularPredictor.load)])
+        for path in [self.FORMATION_INDEX, self.FORM_TRACKER]:
+            if os.path.exists(path):
+                self.registry.get(path)
+
+    def formation_index(self, historical_path=None):
+        """Formation win-rate index saved at training time.
+
+        Models trained before the index existed get it built once from
+        ``historical_path``.
+        """
+        if not os.path.exists(self.FORMATION_INDEX):
+            if historical_path is None:
+                raise FileNotFoundError(f"{self.FORMATION_INDEX} not found; retrain or pass historical_path")
+            index = FormationIndex()
+            self._add_to_formation_index(index, self._finished_team_rows(pd.read_csv(historical_path)))
+            index.save(self.FORMATION_INDEX)
+        return self.registry.get(self.FORMATION_INDEX)
+
+    def form_tracker(self, historical_path=None):
+        """Each team's last finished results, saved at training time, behind the ``recent_*`` features.
+
+        Models trained before the tracker existed get it built once from
+        ``historical_path``.
+        """
+        if not os.path.exists(self.FORM_TRACKER):
+            if historical_path is None:
+                raise FileNotFoundError(f"{self.FORM_TRACKER} not found; retrain or pass historical_path")
+            tracker = FormTracker()
+            self._add_to_form_tracker(tracker, self._finished_team_rows(pd.read_csv(historical_path)))
+            tracker.save(self.FORM_TRACKER)
+        return self.registry.get(self.FORM_TRACKER)
+
+    def add_finished_fixtures(self, fixtures):
+        """Fold finished fixtures (CSV path or DataFrame in the historical format) into the formation index and form tracker.
+
+        Fixtures either of them has already counted, including the training
+        data, are skipped, so sending a fixture again changes nothing.
+        """
+        df_team = self._finished_team_rows(pd.read_csv(fixtures) if isinstance(fixtures, str) else fixtures)
+        index = FormationIndex.load(self.FORMATION_INDEX) if os.path.exists(self.FORMATION_INDEX) else FormationIndex()
+        self._add_to_formation_index(index, df_team)
+        index.save(self.FORMATION_INDEX)
+        tracker = FormTracker.load(self.FORM_TRACKER) if os.path.exists(self.FORM_TRACKER) else FormTracker()
+        self._add_to_form_tracker(tracker, df_team)
+        tracker.save(self.FORM_TRACKER)
+        return index
+
+    def _finished_team_rows(self, df):
+        # A fixture sent more than once (e.g. as several live snapshots) counts once, with its last row
+        df = df.drop_duplicates('fixture_id', keep='last')
+        return convert_to_team_level_live(df.assign(
+            home_rank_dif=np.nan, away_rank_dif=np.nan, home_points_dif=np.nan, away_points_dif=np.nan))
+
+    def _add_to_form_tracker(self, tracker, df_team):
+        team_encoder = self.registry.get(self.ENCODERS['team'])
+        df_team = df_team[df_team['team'].isin(team_encoder.classes_)]
+        tracker.add_fixtures(df_team.assign(team=team_encoder.transform(df_team['team'])))
+
+    def _add_to_formation_index(self, index, df_team):
+        team_encoder = self.registry.get(self.ENCODERS['team_formation'])
+        opp_encoder = self.registry.get(self.ENCODERS['opponent_formation'])
+        known = (df_team['team_formation'].isin(team_encoder.classes_)
+                 & df_team['opponent_formation'].isin(opp_encoder.classes_))
+        df_team = df_team[known]
+        index.add(team_encoder.transform(df_team['team_formation']),
+                  opp_encoder.transform(df_team['opponent_formation']),
+                  df_team['team_win'], df_team['fixture_id'])
+
     def train(self, path="data/all_data_with_rank_and_point.csv"):
+        # Not served from the feature store: processing is what (re)writes the encoders and scaler to models/
         df = self.processor.load_and_process(path)
 
         features = [
@@ -126,10 +243,43 @@ class LiveMatchModel:
         print("\n🏆 Leaderboard:")
         print(self.predictor.leaderboard(test_data, silent=True)[['model', 'score_val']])
 
-    def predict(self, snapshot_path, historical_path, team_info):
+    def predict(self, snapshot_path, historical_path=None, team_info=None):
         df_snapshot = pd.read_csv(snapshot_path)
-        df_historical = pd.read_csv(historical_path)
-
+        index = self.formation_index(historical_path)
+        tracker = self.form_tracker(historical_path)
+        snapshot_team, features = self._snapshot_features(df_snapshot, index, tracker, team_info or {})
+
+        predictor = self.registry.get(self.model_path, TabularPredictor.load)
+        return predictor.predict_proba(snapshot_team[features])
+
+    def predict_batch(self, snapshots, historical_path=None, team_info=None):
+        """Predict many live fixtures with one feature build and one ``predict_proba`` call.
+
+        ``snapshots`` is a DataFrame of snapshot rows or an iterable of row
+        dicts / DataFrames, in the same format as the snapshot CSV.
+        Returns ``{(fixture_id, team): {class: probability}}``; if a fixture
+        has several snapshot rows, its last row wins.
+        """
+        if isinstance(snapshots, pd.DataFrame):
+            df_snapshot = snapshots.reset_index(drop=True)
+        else:
+            df_snapshot = pd.concat([pd.DataFrame([s]) if isinstance(s, dict) else s for s in snapshots], ignore_index=True)
+        index = self.formation_index(historical_path)
+        tracker = self.form_tracker(historical_path)
+
+        # Team-level rows are all home sides, then all away sides; keys are taken before scaling
+        fixture_ids = pd.concat([df_snapshot['fixture_id'], df_snapshot['fixture_id']], ignore_index=True)
+        team_names = pd.concat([df_snapshot['home_team'], df_snapshot['away_team']], ignore_index=True)
+        snapshot_team, features = self._snapshot_features(df_snapshot, index, tracker, team_info or {})
+
+        predictor = self.registry.get(self.model_path, TabularPredictor.load)
+        probs = predictor.predict_proba(snapshot_team[features])
+        return {
+            (fixture_id, team): row
+            for fixture_id, team, row in zip(fixture_ids, team_names, probs.to_dict('records'))
+        }
+
+    def _snapshot_features(self, df_snapshot, formation_index, form_tracker, team_info):
         # Add rank & points
         def get_rank(team): return team_info.get(team, {}).get('rank', np.nan)
         def get_points(team): return team_info.get(team, {}).get('points', np.nan)
@@ -140,15 +290,15 @@ class LiveMatchModel:
         df_snapshot['away_points'] = df_snapshot['away_team'].apply(get_points)
 
         # Differences
-        for df in [df_snapshot, df_historical]:
-            df['home_rank_dif'] = df['home_rank'] - df['away_rank']
-            df['away_rank_dif'] = -df['home_rank_dif']
-            df['home_points_dif'] = df['home_points'] - df['away_points']
-            df['away_points_dif'] = -df['home_points_dif']
+        df_snapshot['home_rank_dif'] = df_snapshot['home_rank'] - df_snapshot['away_rank']
+        df_snapshot['away_rank_dif'] = -df_snapshot['home_rank_dif']
+        df_snapshot['home_points_dif'] = df_snapshot['home_points'] - df_snapshot['away_points']
+        df_snapshot['away_points_dif'] = -df_snapshot['home_points_dif']
 
         # Convert to team level
         snapshot_team = convert_to_team_level_live(df_snapshot)
-        snapshot_team['timestamp'] = pd.concat([df_snapshot['timestamp'], df_snapshot['timestamp']]).reset_index(drop=True)
+        if 'timestamp' in df_snapshot.columns:
+            snapshot_team['timestamp'] = pd.concat([df_snapshot['timestamp'], df_snapshot['timestamp']]).reset_index(drop=True)
 
         # Fill missing values
         fill_zero = ['team_red_cards', 'team_yellow_cards', 'team_saves', 'opponent_red_cards', 'opponent_yellow_cards', 'opponent_saves', 'team_offsides', 'opponent_offsides', 'team_attempted_passes', 'opponent_attempted_passes']
@@ -163,24 +313,19 @@ class LiveMatchModel:
         snapshot_team.drop(columns=['team_successful_passes', 'opponent_successful_passes'], inplace=True)
 
         # Load encoders
-        snapshot_team['team'] = joblib.load("models/le_team.pkl").transform(snapshot_team['team'])
-        snapshot_team['opponent'] = joblib.load("models/le_opp.pkl").transform(snapshot_team['opponent'])
-        snapshot_team['team_formation'] = joblib.load("models/le_form_team.pkl").transform(snapshot_team['team_formation'])
-        snapshot_team['opponent_formation'] = joblib.load("models/le_form_opp.pkl").transform(snapshot_team['opponent_formation'])
+        for col, encoder_path in self.ENCODERS.items():
+            snapshot_team[col] = self.registry.get(encoder_path).transform(snapshot_team[col])
 
         # Form win rate
-        full_team = convert_to_team_level_live(df_historical)
-        full_team['team_win'] = (full_team['team_goals'] > full_team['opponent_goals']).astype(int)
+        snapshot_team['team_form_win_rate'] = snapshot_team['team_formation'].map(formation_index.team_rates()).fillna(0.5)
+        snapshot_team['opponent_form_win_rate'] = snapshot_team['opponent_formation'].map(formation_index.opponent_rates()).fillna(0.5)
 
-        team_form_win_rate = full_team.groupby('team_formation')['team_win'].mean().to_dict()
-        opp_form_win_rate = full_team.groupby('opponent_formation')['team_win'].apply(lambda x: 1 - x.mean()).to_dict()
-        snapshot_team['team_form_win_rate'] = snapshot_team['team_formation'].map(team_form_win_rate).fillna(0.5)
-        snapshot_team['opponent_form_win_rate'] = snapshot_team['opponent_formation'].map(opp_form_win_rate).fillna(0.5)
-
-        snapshot_team = compute_recent_form(snapshot_team)
+        # Form going into the fixture, from finished fixtures only: snapshots read it and never add to it
+        wins, draws, losses = form_tracker.lookup(snapshot_team['team'].to_numpy())
+        snapshot_team['recent_wins'], snapshot_team['recent_draws'], snapshot_team['recent_losses'] = wins, draws, losses
 
         # Scale features
-        scaler = joblib.load("models/scaler.pkl")
+        scaler = self.registry.get(self.SCALER)
         scale_cols = list(scaler.feature_names_in_)
         snapshot_team[scale_cols] = pd.DataFrame(
             scaler.transform(snapshot_team[scale_cols]),
@@ -188,23 +333,22 @@ class LiveMatchModel:
             index=snapshot_team.index
         )
 
-        predictor = TabularPredictor.load(self.model_path)
         features = scale_cols + ['season', 'league', 'game_week', 'team', 'opponent', 'is_home', 'team_formation', 'opponent_formation']
-        preds = predictor.predict_proba(snapshot_team[features])
-
-        return preds
+        return snapshot_team, features
 
 
 
 class FatigueModel:
-    def __init__(self, model_path="models/", data_path="data/players_detailed_all_fixtures_fixed.csv"):
+    def __init__(self, model_path="models/", data_path="data/players_detailed_all_fixtures_fixed.csv", feature_store=None, registry=None):
         self.model_path = model_path
         self.data_path = data_path
         self.processor = FatigueProcessor()
+        self.feature_store = feature_store or FeatureStore()
+        self.registry = registry or default_registry
         self.predictor = None
 
     def train(self):
-        df = self.processor.load_and_process(self.data_path)
+        df = self.feature_store.load_or_process(self.processor, self.data_path)
         train_data, test_data = train_test_split(df, test_size=0.2, random_state=42, shuffle=True)
 
         self.predictor = TabularPredictor(label="is_fatigued", path=self.model_path, problem_type="binary")
@@ -219,12 +363,26 @@ class FatigueModel:
         print(classification_report(y_true, y_pred))
 
     def load(self):
-        self.predictor = TabularPredictor.load(self.model_path)
+        self.predictor = self.registry.get(self.model_path, TabularPredictor.load)
+
+    def warm_up(self):
+        self.load()
 
     def predict(self, csv_path):
+        self.load()
         df = self.processor.load_and_process(csv_path)
         preds = self.predictor.predict(df.drop(columns=["is_fatigued"], errors='ignore'))
         probs = self.predictor.predict_proba(df.drop(columns=["is_fatigued"], errors='ignore'))[1]
         df["fatigue_prediction"] = preds
         df["fatigue_probability"] = probs
         return df.sort_values("fatigue_probability", ascending=False)
+
+    def start_stream(self, history_path=None):
+        """Seed an in-play ``FatigueStream`` from the player history (read once)."""
+        self.load()
+        return FatigueStream.from_history(history_path or self.data_path, self.processor)
+
+    def predict_live(self, stream, player_ids=None):
+        """Fatigue probability for all on-pitch players of ``stream`` in one batched call."""
+        self.load()
+        return stream.predict(self.predictor, player_ids).sort_values(ascending=False)
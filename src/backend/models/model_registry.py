@@ -0,0 +1,91 @@
+import hashlib
+import os
+import threading
+
+import joblib
+
+# Files that change when an AutoGluon predictor directory is retrained; encoders, scalers and
+# other artifacts saved next to it are registered separately and must not invalidate it
+PREDICTOR_FILES = ['predictor.pkl', 'learner.pkl']
+
+
+def _signed_files(path):
+    if os.path.isdir(path):
+        return [os.path.join(path, name) for name in PREDICTOR_FILES if os.path.isfile(os.path.join(path, name))]
+    return [path]
+
+
+def _stat_signature(path):
+    if os.path.isdir(path):
+        return tuple(
+            (os.path.basename(file_path), os.stat(file_path).st_mtime_ns, os.stat(file_path).st_size)
+            for file_path in _signed_files(path)
+        )
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _content_hash(path):
+    digest = hashlib.sha256()
+    for file_path in _signed_files(path):
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Keeps loaded models, encoders and scalers in memory between predictions.
+
+    Artifacts are keyed by absolute path and loader. Every ``get`` re-checks
+    the file's mtime and size (for a predictor directory, those of
+    ``PREDICTOR_FILES``) and reloads when they changed; with
+    ``verify_hash`` the content hash is checked as well. Each artifact
+    loads under its own lock, so a slow load never blocks ``get`` for the
+    others.
+    """
+
+    def __init__(self, verify_hash=False):
+        self.verify_hash = verify_hash
+        self._entries = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def _signature(self, path):
+        signature = _stat_signature(path)
+        if self.verify_hash:
+            signature = (signature, _content_hash(path))
+        return signature
+
+    def get(self, path, loader=joblib.load):
+        key = (os.path.abspath(path), loader)
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+        # One load per artifact at a time; other artifacts stay available meanwhile
+        with loading:
+            signature = self._signature(path)
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is None or entry[0] != signature:
+                entry = (signature, loader(path))
+                with self._lock:
+                    self._entries[key] = entry
+            return entry[1]
+
+    def warm_up(self, artifacts):
+        """Load ``artifacts`` ahead of the first prediction: paths or (path, loader) pairs."""
+        for artifact in artifacts:
+            path, loader = artifact if isinstance(artifact, tuple) else (artifact, joblib.load)
+            self.get(path, loader)
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            path = os.path.abspath(path)
+            for key in [key for key in self._entries if key[0] == path]:
+                del self._entries[key]
+
+
+registry = ModelRegistry()
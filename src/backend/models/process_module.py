@@ -1,16 +1,455 @@
+import copy
+from bisect import bisect_left, insort
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
+from pandas.api.types import union_categoricals
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 import joblib
 
 
+MATCH_STATS = ['shots', 'shots_on_target', 'possession', 'goalkeeper_saves',
+               'yellow_cards', 'red_cards', 'corners', 'fouls', 'offsides',
+               'attempted_passes', 'successful_passes']
+
+
+MATCH_SCHEMA = {
+    'category': ['league', 'home_team', 'away_team', 'home_formation', 'away_formation'],
+    'float32': [f'{side}_{col}' for side in ['home', 'away']
+                for col in ['goals', 'rank', 'points'] + MATCH_STATS if col != 'possession'],
+    'percent': ['home_possession', 'away_possession'],
+    'int16': ['season'],
+    'int32': ['fixture_id'],
+    'paired': [['home_team', 'away_team'], ['home_formation', 'away_formation']],
+}
+
+
+def parse_percent(series, dtype=float):
+    """Turn values like ``'55%'`` into numbers; numeric columns are returned unchanged."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    return series.astype(str).str.replace('%', '', regex=False).astype(dtype)
+
+
+def fill_category(series, value):
+    """``fillna`` that also works on categoricals, keeping their categories sorted."""
+    if isinstance(series.dtype, pd.CategoricalDtype) and value not in series.cat.categories:
+        series = series.cat.set_categories(sorted([*series.cat.categories, value]))
+    return series.fillna(value)
+
+
+def _apply_schema(df, schema):
+    for col in schema.get('percent', []):
+        if col in df.columns:
+            df[col] = parse_percent(df[col], 'float32')
+    return df
+
+
+def read_typed_csv(path, schema):
+    """Read a CSV with the compact dtypes described by ``schema``.
+
+    ``schema`` keys (all optional): ``columns`` keeps only these columns,
+    ``drop`` skips columns at parse time, ``category``/``float32`` set
+    dtypes while parsing, ``int16``/``int32`` downcast columns without
+    missing values, ``percent`` parses ``'55%'`` strings into float32 and
+    ``paired`` lists column groups (e.g. home/away team) that share one
+    categorical dtype.
+    """
+    keep = schema.get('columns')
+    drop = set(schema.get('drop', []))
+    usecols = [col for col in pd.read_csv(path, nrows=0).columns
+               if col not in drop and (keep is None or col in keep)]
+    dtype = {col: 'category' for col in schema.get('category', []) if col in usecols}
+    dtype.update({col: 'float32' for col in schema.get('float32', []) if col in usecols})
+    dtype.update({col: str for col in schema.get('percent', []) if col in usecols})
+
+    df = _apply_schema(pd.read_csv(path, usecols=usecols, dtype=dtype), schema)
+
+    for cols in schema.get('paired', []):
+        if all(col in df.columns for col in cols):
+            categories = union_categoricals([df[col] for col in cols], sort_categories=True).categories
+            for col in cols:
+                df[col] = df[col].cat.set_categories(categories)
+    for int_dtype in ['int16', 'int32']:
+        for col in schema.get(int_dtype, []):
+            if col in df.columns and df[col].notna().all():
+                df[col] = df[col].astype(int_dtype)
+    return df
+
+
+def _swap_side(col):
+    return col.replace('home', 'away') if 'home' in col else col.replace('away', 'home')
+
+
+def to_team_level(df, shared_cols, side_map, interleave=False):
+    """Reshape one row per fixture into one row per team.
+
+    ``side_map`` renames the ``home_*``/``away_*`` columns from the home side's
+    point of view; the away view reuses it with the sides swapped. With
+    ``interleave`` the home and away rows of each fixture are adjacent,
+    otherwise all home rows come first.
+    """
+    away_map = {_swap_side(col): name for col, name in side_map.items()}
+
+    df_home = df[shared_cols + list(side_map)].rename(columns=side_map)
+    df_home['is_home'] = 1
+    df_away = df[shared_cols + list(away_map)].rename(columns=away_map)
+    df_away['is_home'] = 0
+
+    df_team = pd.concat([df_home, df_away], ignore_index=True)
+    if interleave:
+        n = len(df)
+        df_team = df_team.take(np.arange(2 * n).reshape(2, n).T.ravel()).reset_index(drop=True)
+    return df_team
+
+
+def match_result(goals_for, goals_against):
+    goals_for = np.asarray(goals_for)
+    goals_against = np.asarray(goals_against)
+    return np.select([goals_for > goals_against, goals_for < goals_against], ['Win', 'Loss'], default='Draw')
+
+
+LIVE_SIDE_MAP = {
+    'home_team': 'team', 'away_team': 'opponent',
+    'home_goals': 'team_goals', 'away_goals': 'opponent_goals',
+    'home_shots_on_target': 'team_shots_on_target', 'away_shots_on_target': 'opponent_shots_on_target',
+    'home_shots': 'team_shots', 'away_shots': 'opponent_shots',
+    'home_fouls': 'team_fouls', 'away_fouls': 'opponent_fouls',
+    'home_corners': 'team_corners', 'away_corners': 'opponent_corners',
+    'home_offsides': 'team_offsides', 'away_offsides': 'opponent_offsides',
+    'home_possession': 'team_possession', 'away_possession': 'opponent_possession',
+    'home_yellow_cards': 'team_yellow_cards', 'away_yellow_cards': 'opponent_yellow_cards',
+    'home_red_cards': 'team_red_cards', 'away_red_cards': 'opponent_red_cards',
+    'home_goalkeeper_saves': 'team_saves', 'away_goalkeeper_saves': 'opponent_saves',
+    'home_attempted_passes': 'team_attempted_passes', 'away_attempted_passes': 'opponent_attempted_passes',
+    'home_successful_passes': 'team_successful_passes', 'away_successful_passes': 'opponent_successful_passes',
+    'home_formation': 'team_formation', 'away_formation': 'opponent_formation',
+    'home_rank': 'team_rank', 'away_rank': 'opponent_rank',
+    'home_points': 'team_points', 'away_points': 'opponent_points',
+    'home_rank_dif': 'team_rank_dif', 'away_rank_dif': 'opponent_rank_dif',
+    'home_points_dif': 'team_points_dif', 'away_points_dif': 'opponent_points_dif',
+}
+
+
+def convert_to_team_level_live(df):
+    shared_cols = ['fixture_id', 'league', 'season', 'date', 'stadium', 'game_week']
+    if 'timestamp' in df.columns:
+        shared_cols.append('timestamp')
+
+    df_team = to_team_level(df, shared_cols, LIVE_SIDE_MAP)
+    df_team['team_win'] = (df_team['team_goals'] > df_team['opponent_goals']).astype(int)
+    return df_team
+
+
+class LeagueTable:
+    """Running points table for one league-season.
+
+    Results are applied one team-row at a time in date order. Teams enter the
+    table the first time they score points; ties are ranked by that entry
+    order, so ranks match a stable sort of the table by points.
+    """
+
+    def __init__(self):
+        self.points = {}
+        self._entry = {}
+        self._keys = []
+
+    def _key(self, team):
+        return (-self.points[team], self._entry[team])
+
+    def _add(self, team, pts):
+        if team in self.points:
+            del self._keys[bisect_left(self._keys, self._key(team))]
+            self.points[team] += pts
+        else:
+            self._entry[team] = len(self._entry)
+            self.points[team] = pts
+        insort(self._keys, self._key(team))
+
+    def rank(self, team):
+        if team not in self.points:
+            return np.nan
+        return bisect_left(self._keys, self._key(team)) + 1
+
+    def standing(self, team):
+        return self.points.get(team, 0), self.rank(team)
+
+    def apply(self, team, opponent, result):
+        if result == 'Win':
+            self._add(team, 3)
+        elif result == 'Draw':
+            self._add(team, 1)
+            self._add(opponent, 1)
+        elif result == 'Loss':
+            self._add(opponent, 3)
+
+    def advance(self, matchday):
+        """Apply a matchday of team-level rows (``team_name``, ``opponent_name``, ``team_result``)."""
+        for team, opponent, result in zip(matchday['team_name'], matchday['opponent_name'], matchday['team_result']):
+            self.apply(team, opponent, result)
+        return self
+
+    def to_team_info(self):
+        """Current table in the ``team_info`` format used by ``LiveMatchModel.predict``."""
+        return {team: {'rank': self.rank(team), 'points': pts} for team, pts in self.points.items()}
+
+
+H2H_RESULTS = {'Win': 'h2h_home_win_rate', 'Draw': 'h2h_home_draw_rate', 'Loss': 'h2h_home_loss_rate'}
+H2H_DEFAULTS = {'h2h_home_win_rate': 0.5, 'h2h_home_draw_rate': 0.3, 'h2h_home_loss_rate': 0.2}
+
+
+class FormationIndex:
+    """Win counts per formation behind ``team_form_win_rate``/``opponent_form_win_rate``.
+
+    Built from the training frame (encoded formations) and updated in place as
+    finished fixtures come in, so live features are dictionary lookups. The
+    fixture ids already counted are kept, so adding a fixture twice is a no-op.
+    """
+
+    def __init__(self):
+        self.team = {}
+        self.opponent = {}
+        self.fixtures = set()
+
+    def __setstate__(self, state):
+        self.__dict__.update({'fixtures': set(), **state})  # indexes saved before fixture ids were kept
+
+    @classmethod
+    def from_frame(cls, df):
+        index = cls()
+        index.add(df['team_formation'], df['opponent_formation'], df['team_win'], df['fixture_id'])
+        return index
+
+    def add(self, team_formations, opponent_formations, team_wins, fixture_ids=None):
+        frame = pd.DataFrame({'team': np.asarray(team_formations), 'opponent': np.asarray(opponent_formations),
+                              'win': np.asarray(team_wins)})
+        if fixture_ids is not None:
+            fixture_ids = pd.Series(np.asarray(fixture_ids))
+            new = ~fixture_ids.isin(self.fixtures).to_numpy()
+            frame = frame[new]
+            self.fixtures.update(fixture_ids[new].tolist())
+        for side, counts in [('team', self.team), ('opponent', self.opponent)]:
+            totals = frame.groupby(side)['win'].agg(['sum', 'count'])
+            for formation, wins, games in zip(totals.index, totals['sum'], totals['count']):
+                seen_wins, seen_games = counts.get(formation, (0, 0))
+                counts[formation] = (seen_wins + wins, seen_games + games)
+
+    def team_rates(self):
+        return {formation: wins / games for formation, (wins, games) in self.team.items()}
+
+    def opponent_rates(self):
+        return {formation: 1 - wins / games for formation, (wins, games) in self.opponent.items()}
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
+
+
+class FormTracker:
+    """Wins, draws and losses over each team's last ``n_matches`` rows.
+
+    Counts are kept alongside a bounded history per team, so each row costs
+    O(1). Reuse one tracker across calls to extend form with new rows
+    instead of rescanning everything seen so far. ``add_fixtures`` records
+    the fixture ids it added and skips them afterwards.
+    """
+
+    OUTCOMES = (1, 0.5, 0)
+
+    def __init__(self, n_matches=5):
+        self.n_matches = n_matches
+        self.history = {}
+        self.counts = {}
+        self.fixtures = set()
+
+    def __setstate__(self, state):
+        self.__dict__.update({'fixtures': set(), **state})
+
+    def form(self, team):
+        return tuple(self.counts.get(team, (0, 0, 0)))
+
+    def update(self, team, result):
+        history = self.history.get(team)
+        if history is None:
+            history = self.history[team] = deque()
+            self.counts[team] = [0, 0, 0]
+        counts = self.counts[team]
+        if len(history) == self.n_matches:
+            self._count(counts, history.popleft(), -1)
+        history.append(result)
+        self._count(counts, result, 1)
+
+    def _count(self, counts, result, step):
+        for i, outcome in enumerate(self.OUTCOMES):
+            if result == outcome:
+                counts[i] += step
+
+    def apply(self, teams, results):
+        """Form before each row, then add the row; returns (wins, draws, losses) arrays."""
+        form = np.zeros((len(teams), 3), dtype=np.int64)
+        for i, (team, result) in enumerate(zip(teams, results)):
+            form[i] = self.form(team)
+            self.update(team, result)
+        return form[:, 0], form[:, 1], form[:, 2]
+
+    @classmethod
+    def from_fixtures(cls, df, n_matches=5):
+        tracker = cls(n_matches)
+        tracker.add_fixtures(df)
+        return tracker
+
+    def add_fixtures(self, df):
+        """Add finished team-level rows (``team``, ``team_win``, ``date``, ``fixture_id``) in match order."""
+        df = df[~df['fixture_id'].isin(self.fixtures)]
+        self.fixtures.update(df['fixture_id'].tolist())
+        order = pd.DataFrame({'date': pd.to_datetime(df['date'], errors='coerce'),
+                              'fixture_id': df['fixture_id'].to_numpy()})
+        order = order.sort_values(['date', 'fixture_id'], kind='stable').index
+        self.apply(df['team'].to_numpy()[order], df['team_win'].to_numpy()[order])
+
+    def lookup(self, teams):
+        """Current form of each team without adding any rows; returns (wins, draws, losses) arrays."""
+        form = np.zeros((len(teams), 3), dtype=np.int64)
+        for i, team in enumerate(teams):
+            form[i] = self.form(team)
+        return form[:, 0], form[:, 1], form[:, 2]
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
+
+
+def compute_recent_form(df, n_matches=5, tracker=None):
+    """Add ``recent_wins/draws/losses`` from each team's previous rows, in row order."""
+    if tracker is None:
+        tracker = FormTracker(n_matches)
+    df['recent_wins'], df['recent_draws'], df['recent_losses'] = tracker.apply(
+        df['team'].to_numpy(), df['team_win'].to_numpy())
+    return df
+
+
+def impute(df, mean_cols=(), zero_cols=(), by=('league', 'season')):
+    """Fill ``mean_cols`` with their per-``by`` group means and ``zero_cols`` with 0.
+
+    All group means come from a single groupby and are broadcast back with
+    ``fillna``.
+    """
+    mean_cols = list(mean_cols)
+    zero_cols = list(zero_cols)
+    if mean_cols:
+        means = df.groupby(list(by))[mean_cols].transform('mean')
+        df[mean_cols] = df[mean_cols].fillna(means)
+    if zero_cols:
+        df[zero_cols] = df[zero_cols].fillna(0)
+    return df
+
+
+def shifted_rolling_mean(df, cols, by, window, sort_by=None, per_group=True):
+    """Mean of each of ``cols`` over the previous ``window`` rows of its ``by`` group.
+
+    The frame is sorted once by ``sort_by`` (if given) and every column is
+    shifted and averaged in one grouped pass. The result is aligned to
+    ``df.index``. With ``per_group=False`` only the shift is grouped and the
+    window runs across the whole frame, as ``FatigueProcessor`` has always
+    done for its ``_avg5`` features.
+    """
+    ordered = df.sort_values(sort_by) if sort_by else df
+    shifted = ordered.groupby(by)[cols].shift()
+    if not per_group:
+        return shifted.rolling(window, min_periods=1).mean().reindex(df.index)
+    means = shifted.groupby([ordered[key] for key in by]).rolling(window, min_periods=1).mean()
+    return means.reset_index(level=list(range(len(by))), drop=True).reindex(df.index)
+
+
+def grouped_window_diff(df, cols, by, window):
+    """Last minus first value of each trailing ``window`` rows within ``by`` groups.
+
+    Matches ``rolling(window, min_periods=1).apply(lambda s: s.iloc[-1] - s.iloc[0])``
+    per group: rows near the start of a group compare against the group's
+    first row.
+    """
+    grouped = df.groupby(by)[cols]
+    position = df.groupby(by).cumcount().to_numpy()
+    values = df[cols].to_numpy(dtype=float)
+    first = grouped.shift(window - 1).to_numpy(dtype=float, copy=True)
+    for lag in range(window - 1):
+        head = position == lag
+        first[head] = values[head] if lag == 0 else grouped.shift(lag).to_numpy(dtype=float)[head]
+    return pd.DataFrame(values - first, index=df.index, columns=cols)
+
+
+def _build_shard(processor, shard):
+    return processor._build_base(shard)
+
 
 class PreMatchProcessor:
-    def __init__(self, window=5):
+    VERSION = 1  # bump whenever the output changes, so FeatureStore entries from older code are rebuilt
+    MEAN_FILL_COLS = [
+        'home_rank', 'away_rank', 'home_points', 'away_points',
+        'home_yellow_cards', 'away_yellow_cards', 'home_goalkeeper_saves', 'away_goalkeeper_saves',
+        'home_attempted_passes', 'home_successful_passes', 'away_attempted_passes', 'away_successful_passes',
+        'home_corners', 'away_corners', 'home_shots', 'away_shots'
+    ]
+    ZERO_FILL_COLS = ['home_offsides', 'away_offsides', 'home_red_cards', 'away_red_cards']
+    PARTITION_COLS = ['league', 'season']
+    ROLLING_COLS = [
+        'team_shots', 'team_shots_on_target', 'team_goalkeeper_saves', 'team_possession',
+        'team_corners', 'team_fouls', 'team_yellow_cards', 'team_red_cards', 'team_offsides',
+        'team_attempted_passes', 'team_successful_passes', 'opponent_shots',
+        'opponent_shots_on_target', 'opponent_goalkeeper_saves', 'opponent_possession',
+        'opponent_corners', 'opponent_fouls', 'opponent_yellow_cards', 'opponent_red_cards',
+        'opponent_offsides', 'opponent_attempted_passes', 'opponent_successful_passes'
+    ]
+    SCHEMA = dict(MATCH_SCHEMA, columns=['fixture_id', 'league', 'season', 'date'] + [
+        f'{side}_{col}' for side in ['home', 'away']
+        for col in ['team', 'goals', 'rank', 'points', 'formation'] + MATCH_STATS])
+
+    def __init__(self, window=5, mean_fill_cols=None, zero_fill_cols=None, workers=1):
         self.window = window
+        self.workers = workers
+        self.mean_fill_cols = self.MEAN_FILL_COLS if mean_fill_cols is None else mean_fill_cols
+        self.zero_fill_cols = self.ZERO_FILL_COLS if zero_fill_cols is None else zero_fill_cols
 
     def load_and_process(self, path):
-        df = pd.read_csv(path)
+        return self.finalize(self.build_base(self.read(path)))
+
+    def read(self, path):
+        return read_typed_csv(path, self.SCHEMA)
+
+    def build_base(self, df):
+        """Stages that only look inside one (league, season): everything up to standings.
+
+        With ``workers > 1`` the (league, season) partitions are split into
+        ``workers`` contiguous blocks of similar size, each block is built in
+        its own process and the blocks are concatenated in (league, season)
+        order, the order the serial ``compute_points_and_ranks`` leaves them
+        in, so the result is identical. H2H crosses seasons and stays in
+        ``finalize``.
+        """
+        if self.workers > 1:
+            shards = self._shard(df)
+            if len(shards) > 1:
+                with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+                    parts = list(pool.map(_build_shard, [self] * len(shards), shards))
+                return pd.concat(parts, ignore_index=True)
+        return self._build_base(df)
+
+    def _shard(self, df):
+        groups = df.groupby(self.PARTITION_COLS, observed=True, dropna=False, sort=True).ngroup().to_numpy()
+        sizes = np.bincount(groups)
+        block = np.searchsorted(np.cumsum(sizes), np.linspace(0, len(df), self.workers + 1)[1:-1], side='right')
+        bounds = np.unique(np.concatenate([[0], block, [len(sizes)]]))
+        return [df[(groups >= lo) & (groups < hi)] for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+    def _build_base(self, df):
         df['date'] = pd.to_datetime(df['date'], errors='coerce')
         df.dropna(subset=['date'], inplace=True)
         df = self.fill_missing_values(df)
@@ -22,92 +461,52 @@ class PreMatchProcessor:
         df_sorted['goal_difference'] = df_sorted['avg_goals_for'] - df_sorted['avg_goals_against']
         df_final = self.merge_features(df_team, df_sorted)
         df_final = self.add_opponent_features(df_final)
-        df_final = self.compute_points_and_ranks(df_final)
-        df_final = self.compute_h2h_rates(df_final)
-        df_final = self.final_cleaning(df_final)
-        return df_final
+        return self.compute_points_and_ranks(df_final)
+
+    def finalize(self, df):
+        df = self.compute_h2h_rates(df)
+        return self.final_cleaning(df)
 
     def fill_missing_values(self, df):
-        df['home_rank'] = df.groupby(['league', 'season'])['home_rank'].transform(lambda x: x.fillna(x.mean()))
-        df['away_rank'] = df.groupby(['league', 'season'])['away_rank'].transform(lambda x: x.fillna(x.mean()))
-        df['home_points'] = df.groupby(['league', 'season'])['home_points'].transform(lambda x: x.fillna(x.mean()))
-        df['away_points'] = df.groupby(['league', 'season'])['away_points'].transform(lambda x: x.fillna(x.mean()))
-        df['home_offsides'] = df['home_offsides'].fillna(0)
-        df['away_offsides'] = df['away_offsides'].fillna(0)
-        df['home_red_cards'] = df['home_red_cards'].fillna(0)
-        df['away_red_cards'] = df['away_red_cards'].fillna(0)
-        df['home_yellow_cards'] = df.groupby(['league', 'season'])['home_yellow_cards'].transform(lambda x: x.fillna(x.mean()))
-        df['away_yellow_cards'] = df.groupby(['league', 'season'])['away_yellow_cards'].transform(lambda x: x.fillna(x.mean()))
-        df['home_goalkeeper_saves'] = df.groupby(['league', 'season'])['home_goalkeeper_saves'].transform(lambda x: x.fillna(x.mean()))
-        df['away_goalkeeper_saves'] = df.groupby(['league', 'season'])['away_goalkeeper_saves'].transform(lambda x: x.fillna(x.mean()))
-        for col in ['home_attempted_passes', 'home_successful_passes', 'away_attempted_passes', 'away_successful_passes']:
-            df[col] = df.groupby(['league', 'season'])[col].transform(lambda x: x.fillna(x.mean()))
-        df['home_corners'] = df.groupby(['league', 'season'])['home_corners'].transform(lambda x: x.fillna(x.mean()))
-        df['away_corners'] = df.groupby(['league', 'season'])['away_corners'].transform(lambda x: x.fillna(x.mean()))
-        df['home_shots'] = df.groupby(['league', 'season'])['home_shots'].transform(lambda x: x.fillna(x.mean()))
-        df['away_shots'] = df.groupby(['league', 'season'])['away_shots'].transform(lambda x: x.fillna(x.mean()))
-        return df
+        return impute(df, mean_cols=self.mean_fill_cols, zero_cols=self.zero_fill_cols)
 
     def clean_formations(self, df):
-        df['home_formation'] = df['home_formation'].fillna('Unknown')
-        df['away_formation'] = df['away_formation'].fillna('Unknown')
+        df['home_formation'] = fill_category(df['home_formation'], 'Unknown')
+        df['away_formation'] = fill_category(df['away_formation'], 'Unknown')
         return df
 
     def clean_possession(self, df):
         for col in ['home_possession', 'away_possession']:
-            df[col] = df[col].astype(str).str.replace('%', '').astype(float)
+            df[col] = parse_percent(df[col])
         return df
 
     def convert_to_team_level(self, df):
-        team_rows = []
-        for _, row in df.iterrows():
-            for is_home in [1, 0]:
-                prefix = 'home_' if is_home else 'away_'
-                opponent_prefix = 'away_' if is_home else 'home_'
-                team_row = {
-                    'fixture_id': row['fixture_id'],
-                    'league': row['league'],
-                    'season': row['season'],
-                    'date': row['date'],
-                    'is_home': is_home,
-                    'team_name': row[prefix + 'team'],
-                    'opponent_name': row[opponent_prefix + 'team'],
-                    'team_goals': row[prefix + 'goals'],
-                    'opponent_goals': row[opponent_prefix + 'goals'],
-                    'team_rank': row[prefix + 'rank'],
-                    'opponent_rank': row[opponent_prefix + 'rank'],
-                    'team_points': row[prefix + 'points'],
-                    'opponent_points': row[opponent_prefix + 'points'],
-                    'team_formation': row[prefix + 'formation'],
-                    'opponent_formation': row[opponent_prefix + 'formation'],
-                }
-                for stat in ['shots', 'shots_on_target', 'possession', 'goalkeeper_saves',
-                             'yellow_cards', 'red_cards', 'corners', 'fouls', 'offsides',
-                             'attempted_passes', 'successful_passes']:
-                    team_row[f'team_{stat}'] = row[prefix + stat]
-                    team_row[f'opponent_{stat}'] = row[opponent_prefix + stat]
-                team_rows.append(team_row)
-        df_team = pd.DataFrame(team_rows)
-        df_team['team_result'] = df_team.apply(
-            lambda x: 'Win' if x['team_goals'] > x['opponent_goals'] else ('Loss' if x['team_goals'] < x['opponent_goals'] else 'Draw'),
-            axis=1
-        )
+        side_map = {'home_team': 'team_name', 'away_team': 'opponent_name'}
+        for col in ['goals', 'rank', 'points', 'formation'] + MATCH_STATS:
+            side_map['home_' + col] = 'team_' + col
+            side_map['away_' + col] = 'opponent_' + col
+        df_team = to_team_level(df, ['fixture_id', 'league', 'season', 'date'], side_map, interleave=True)
+
+        order = ['fixture_id', 'league', 'season', 'date', 'is_home', 'team_name', 'opponent_name']
+        for col in ['goals', 'rank', 'points', 'formation'] + MATCH_STATS:
+            order += ['team_' + col, 'opponent_' + col]
+        df_team = df_team.reindex(columns=order)
+        df_team['team_result'] = match_result(df_team['team_goals'], df_team['opponent_goals'])
         return df_team
 
     def compute_recent_win_rate(self, df):
         df = df.copy()
         df['result_numeric'] = df['team_result'].map({'Win': 1.0, 'Draw': 0.5, 'Loss': 0.0})
-        df['recent_win_rate'] = df.groupby(['league', 'season', 'team_name'])['result_numeric'].transform(
-            lambda x: x.shift().rolling(self.window, min_periods=1).mean())
+        df['recent_win_rate'] = shifted_rolling_mean(
+            df, ['result_numeric'], ['league', 'season', 'team_name'], self.window)['result_numeric']
         df.drop(columns=['result_numeric'], inplace=True)
         return df
 
     def compute_avg_goals(self, df):
         df = df.copy()
-        df['avg_goals_for'] = df.groupby(['league', 'season', 'team_name'])['team_goals'].transform(
-            lambda x: x.shift().rolling(self.window, min_periods=1).mean())
-        df['avg_goals_against'] = df.groupby(['league', 'season', 'team_name'])['opponent_goals'].transform(
-            lambda x: x.shift().rolling(self.window, min_periods=1).mean())
+        means = shifted_rolling_mean(df, ['team_goals', 'opponent_goals'], ['league', 'season', 'team_name'], self.window)
+        df['avg_goals_for'] = means['team_goals']
+        df['avg_goals_against'] = means['opponent_goals']
         return df
 
     def merge_features(self, df_base, df_features):
@@ -135,139 +534,186 @@ class PreMatchProcessor:
 
     def compute_points_and_ranks(self, df):
         df = df.copy().sort_values(by=['league', 'season', 'date']).reset_index(drop=True)
-        df['team_points'] = np.nan
-        df['opponent_points'] = np.nan
-        df['team_rank'] = np.nan
-        df['opponent_rank'] = np.nan
-        for (league, season), group in df.groupby(['league', 'season']):
-            points_table = {}
-            for i, row in group.iterrows():
-                team = row['team_name']
-                opponent = row['opponent_name']
-                team_pts = points_table.get(team, 0)
-                opponent_pts = points_table.get(opponent, 0)
-                df.loc[i, 'team_points'] = team_pts
-                df.loc[i, 'opponent_points'] = opponent_pts
-                ranks = {team_name: rank+1 for rank, (team_name, _) in enumerate(sorted(points_table.items(), key=lambda x: -x[1]))}
-                df.loc[i, 'team_rank'] = ranks.get(team, np.nan)
-                df.loc[i, 'opponent_rank'] = ranks.get(opponent, np.nan)
-                if row['team_result'] == 'Win':
-                    points_table[team] = team_pts + 3
-                elif row['team_result'] == 'Draw':
-                    points_table[team] = team_pts + 1
-                    points_table[opponent] = opponent_pts + 1
-                elif row['team_result'] == 'Loss':
-                    points_table[opponent] = opponent_pts + 3
+        team_points = np.full(len(df), np.nan)
+        opponent_points = np.full(len(df), np.nan)
+        team_rank = np.full(len(df), np.nan)
+        opponent_rank = np.full(len(df), np.nan)
+
+        teams = df['team_name'].to_numpy()
+        opponents = df['opponent_name'].to_numpy()
+        results = df['team_result'].to_numpy()
+        for rows in df.groupby(['league', 'season']).indices.values():
+            table = LeagueTable()
+            for i in rows:
+                team_points[i], team_rank[i] = table.standing(teams[i])
+                opponent_points[i], opponent_rank[i] = table.standing(opponents[i])
+                table.apply(teams[i], opponents[i], results[i])
+
+        df['team_points'] = team_points
+        df['opponent_points'] = opponent_points
+        df['team_rank'] = team_rank
+        df['opponent_rank'] = opponent_rank
         return df
 
     def compute_h2h_rates(self, df):
         df = df.sort_values(by='date').copy()
-        for col in ['h2h_home_win_rate', 'h2h_home_draw_rate', 'h2h_home_loss_rate']:
-            df[col] = np.nan
-        grouped = df.groupby(['team_name', 'opponent_name'])
-        for _, group in grouped:
-            for i in range(len(group)):
-                past = group.iloc[max(0, i - self.window):i]
-                total = len(past)
-                wins = (past['team_result'] == 'Win').sum()
-                draws = (past['team_result'] == 'Draw').sum()
-                losses = (past['team_result'] == 'Loss').sum()
-                df.loc[group.index[i], 'h2h_home_win_rate'] = wins / total if total else np.nan
-                df.loc[group.index[i], 'h2h_home_draw_rate'] = draws / total if total else np.nan
-                df.loc[group.index[i], 'h2h_home_loss_rate'] = losses / total if total else np.nan
+        keys = [df['team_name'], df['opponent_name']]
+        outcomes = pd.DataFrame({result: (df['team_result'] == result).astype(int) for result in H2H_RESULTS})
+        before = outcomes.groupby(keys).cumsum() - outcomes
+        in_window = before - before.groupby(keys).shift(self.window, fill_value=0)
+        total = df.groupby(keys).cumcount().clip(upper=self.window).replace(0, np.nan)
+        for result, col in H2H_RESULTS.items():
+            df[col] = in_window[result] / total
         return df
 
     def final_cleaning(self, df):
-        df = df.fillna({
-            'h2h_home_win_rate': 0.5,
-            'h2h_home_draw_rate': 0.3,
-            'h2h_home_loss_rate': 0.2
-        })
+        df = df.fillna(H2H_DEFAULTS)
         df['team_result'] = df['team_result'].astype('category')
         df = df.drop(columns=['team_goals', 'opponent_goals', 'goal_difference'])
         df['date'] = pd.to_datetime(df['date'])
-        rolling_cols = [
-            'team_shots', 'team_shots_on_target', 'team_goalkeeper_saves', 'team_possession',
-            'team_corners', 'team_fouls', 'team_yellow_cards', 'team_red_cards', 'team_offsides',
-            'team_attempted_passes', 'team_successful_passes', 'opponent_shots',
-            'opponent_shots_on_target', 'opponent_goalkeeper_saves', 'opponent_possession',
-            'opponent_corners', 'opponent_fouls', 'opponent_yellow_cards', 'opponent_red_cards',
-            'opponent_offsides', 'opponent_attempted_passes', 'opponent_successful_passes'
-        ]
-        for col in rolling_cols:
-            base = 'team_name' if col.startswith('team_') else 'opponent_name'
-            df[col + '_avg'] = df.sort_values('date').groupby(['league', 'season', base])[col].transform(
-                lambda x: x.shift().rolling(self.window, min_periods=1).mean())
+        rolling_cols = self.ROLLING_COLS
+        for base in ['team_name', 'opponent_name']:
+            side_cols = [col for col in rolling_cols if col.startswith(base.split('_')[0] + '_')]
+            means = shifted_rolling_mean(df, side_cols, ['league', 'season', base], self.window, sort_by='date')
+            df[[col + '_avg' for col in side_cols]] = means.to_numpy()
         df.drop(columns=rolling_cols, inplace=True)
         return df
 
 
+class TeamHistory:
+    """As-of pre-match features for a single fixture, without rerunning the pipeline.
+
+    Indexes the ``PreMatchProcessor.build_base`` frame by (league, season,
+    team), (league, season, opponent) and (team, opponent). ``features``
+    reads only the two teams' last ``window`` rows on or before the fixture
+    date plus the league table at that date, and returns the same columns
+    ``PreMatchProcessor`` produces (minus ``team_result``) for both sides,
+    as if the fixture had been appended to the history. Like the batch
+    pipeline, the away row's standings already count the unplayed home row
+    as a draw.
+    """
+
+    def __init__(self, base, window=5):
+        self.window = window
+        self.team_cols = [col for col in PreMatchProcessor.ROLLING_COLS if col.startswith('team_')]
+        self.opponent_cols = [col for col in PreMatchProcessor.ROLLING_COLS if col.startswith('opponent_')]
+
+        self.dates = base['date'].to_numpy()
+        self.teams = base['team_name'].to_numpy()
+        self.opponents = base['opponent_name'].to_numpy()
+        self.results = base['team_result'].to_numpy()
+        self.result_numeric = base['team_result'].map({'Win': 1.0, 'Draw': 0.5, 'Loss': 0.0}).to_numpy(dtype=float)
+        self.goals = base[['team_goals', 'opponent_goals']].to_numpy(dtype=float)
+        self.team_stats = base[self.team_cols].to_numpy(dtype=float)
+        self.opponent_stats = base[self.opponent_cols].to_numpy(dtype=float)
+
+        self.season_rows = base.groupby(['league', 'season'], observed=True).indices
+        self.team_rows = base.groupby(['league', 'season', 'team_name'], observed=True).indices
+        self.opponent_rows = base.groupby(['league', 'season', 'opponent_name'], observed=True).indices
+        self.pair_rows = {
+            pair: rows[np.argsort(self.dates[rows], kind='stable')]
+            for pair, rows in base.groupby(['team_name', 'opponent_name'], observed=True).indices.items()
+        }
+        self.tables = {}
+
+    def _until(self, rows, date):
+        """The last ``window`` of ``rows`` (date ordered) dated on or before ``date``."""
+        cut = np.searchsorted(self.dates[rows], date, side='right')
+        return rows[max(0, cut - self.window):cut]
+
+    def standings(self, league, season, date):
+        rows = self.season_rows.get((league, season), np.array([], dtype=int))
+        cut = np.searchsorted(self.dates[rows], date, side='right')
+        full = cut == len(rows)
+        if full and (league, season) in self.tables:
+            return self.tables[(league, season)]
+        table = LeagueTable()
+        for i in rows[:cut]:
+            table.apply(self.teams[i], self.opponents[i], self.results[i])
+        if full:
+            self.tables[(league, season)] = table
+        return table
+
+    @staticmethod
+    def _mean(values):
+        counts = np.sum(~np.isnan(values), axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, np.nansum(values, axis=0) / counts, np.nan)
+
+    def _form(self, league, season, team, date):
+        rows = self._until(self.team_rows.get((league, season, team), np.array([], dtype=int)), date)
+        win_rate = float(self._mean(self.result_numeric[rows]))
+        goals_for, goals_against = self._mean(self.goals[rows]).tolist()
+        return win_rate, goals_for, goals_against, self._mean(self.team_stats[rows])
+
+    def features(self, home, away, date, league, season, home_formation='Unknown', away_formation='Unknown', fixture_id=None):
+        date = pd.Timestamp(date)
+        when = date.to_datetime64()
+        table = copy.deepcopy(self.standings(league, season, when))
+        form = {team: self._form(league, season, team, when) for team in (home, away)}
+        formations = {home: 'Unknown' if pd.isna(home_formation) else home_formation,
+                      away: 'Unknown' if pd.isna(away_formation) else away_formation}
+
+        rows = []
+        for is_home, team, opponent in [(1, home, away), (0, away, home)]:
+            team_points, team_rank = table.standing(team)
+            opponent_points, opponent_rank = table.standing(opponent)
+            table.apply(team, opponent, 'Draw')
+            win_rate, goals_for, goals_against, team_avgs = form[team]
+            opp_win_rate, opp_goals_for, opp_goals_against, _ = form[opponent]
+            opp_rows = self._until(self.opponent_rows.get((league, season, opponent), np.array([], dtype=int)), when)
+            pair_rows = self._until(self.pair_rows.get((team, opponent), np.array([], dtype=int)), when)
+
+            row = {
+                'fixture_id': fixture_id, 'league': league, 'season': season, 'date': date,
+                'is_home': is_home, 'team_name': team, 'opponent_name': opponent,
+                'team_rank': float(team_rank), 'opponent_rank': float(opponent_rank),
+                'team_points': float(team_points), 'opponent_points': float(opponent_points),
+                'team_formation': formations[team], 'opponent_formation': formations[opponent],
+                'recent_win_rate': win_rate, 'avg_goals_for': goals_for, 'avg_goals_against': goals_against,
+                'opponent_recent_win_rate': opp_win_rate, 'opponent_avg_goals_for': opp_goals_for,
+                'opponent_goal_difference': opp_goals_for - opp_goals_against,
+            }
+            past = self.results[pair_rows]
+            for result, col in H2H_RESULTS.items():
+                row[col] = (past == result).sum() / len(past) if len(past) else H2H_DEFAULTS[col]
+            row.update(zip([col + '_avg' for col in self.team_cols], team_avgs))
+            row.update(zip([col + '_avg' for col in self.opponent_cols], self._mean(self.opponent_stats[opp_rows])))
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+
 class LiveMatchProcessor:
-    def __init__(self):
+    ZERO_FILL_COLS = [
+        'team_red_cards', 'team_yellow_cards', 'team_saves',
+        'opponent_red_cards', 'opponent_yellow_cards', 'opponent_saves',
+        'team_offsides', 'opponent_offsides',
+        'team_attempted_passes', 'opponent_attempted_passes'
+    ]
+    SCHEMA = dict(MATCH_SCHEMA, category=MATCH_SCHEMA['category'] + ['stadium'])
+
+    def __init__(self, zero_fill_cols=None):
         self.scaler = StandardScaler()
         self.le_team = LabelEncoder()
         self.le_opp = LabelEncoder()
         self.le_form_team = LabelEncoder()
         self.le_form_opp = LabelEncoder()
+        self.form_tracker = None
+        self.zero_fill_cols = self.ZERO_FILL_COLS if zero_fill_cols is None else zero_fill_cols
 
     def convert_to_team_level_live(self, df):
-        shared_cols = ['fixture_id', 'league', 'season', 'date', 'stadium', 'game_week']
-        if 'timestamp' in df.columns:
-            shared_cols.append('timestamp')
-
-        team_cols = {
-            'home_team': 'team', 'away_team': 'opponent',
-            'home_goals': 'team_goals', 'away_goals': 'opponent_goals',
-            'home_shots_on_target': 'team_shots_on_target', 'away_shots_on_target': 'opponent_shots_on_target',
-            'home_shots': 'team_shots', 'away_shots': 'opponent_shots',
-            'home_fouls': 'team_fouls', 'away_fouls': 'opponent_fouls',
-            'home_corners': 'team_corners', 'away_corners': 'opponent_corners',
-            'home_offsides': 'team_offsides', 'away_offsides': 'opponent_offsides',
-            'home_possession': 'team_possession', 'away_possession': 'opponent_possession',
-            'home_yellow_cards': 'team_yellow_cards', 'away_yellow_cards': 'opponent_yellow_cards',
-            'home_red_cards': 'team_red_cards', 'away_red_cards': 'opponent_red_cards',
-            'home_goalkeeper_saves': 'team_saves', 'away_goalkeeper_saves': 'opponent_saves',
-            'home_attempted_passes': 'team_attempted_passes', 'away_attempted_passes': 'opponent_attempted_passes',
-            'home_successful_passes': 'team_successful_passes', 'away_successful_passes': 'opponent_successful_passes',
-            'home_formation': 'team_formation', 'away_formation': 'opponent_formation',
-            'home_rank': 'team_rank', 'away_rank': 'opponent_rank',
-            'home_points': 'team_points', 'away_points': 'opponent_points',
-            'home_rank_dif': 'team_rank_dif', 'away_rank_dif': 'opponent_rank_dif',
-            'home_points_dif': 'team_points_dif', 'away_points_dif': 'opponent_points_dif',
-        }
+        return convert_to_team_level_live(df)
 
-        df_home = df[shared_cols + list(team_cols.keys())].copy()
-        df_home.rename(columns=team_cols, inplace=True)
-        df_home['is_home'] = 1
-        df_home['team_win'] = (df_home['team_goals'] > df_home['opponent_goals']).astype(int)
-
-        df_away = df[shared_cols + list(team_cols.keys())].copy()
-        swap = {k.replace("home", "away") if "home" in k else k.replace("away", "home"): v for k, v in team_cols.items()}
-        df_away.rename(columns=swap, inplace=True)
-        df_away['is_home'] = 0
-        df_away['team_win'] = (df_away['team_goals'] > df_away['opponent_goals']).astype(int)
-
-        return pd.concat([df_home, df_away], ignore_index=True)
-
-    def compute_recent_form(self, df, n_matches=5):
-        recent_wins, recent_draws, recent_losses = [], [], []
-        for idx, row in df.iterrows():
-            team_id = row['team']
-            past = df.loc[:idx-1]
-            team_data = past[past['team'] == team_id].tail(n_matches)
-            wins = team_data['team_win'].eq(1).sum()
-            draws = team_data['team_win'].eq(0.5).sum()
-            losses = team_data['team_win'].eq(0).sum()
-            recent_wins.append(wins)
-            recent_draws.append(draws)
-            recent_losses.append(losses)
-        df['recent_wins'] = recent_wins
-        df['recent_draws'] = recent_draws
-        df['recent_losses'] = recent_losses
-        return df
+    def compute_recent_form(self, df, n_matches=5, incremental=False):
+        if not incremental or self.form_tracker is None or self.form_tracker.n_matches != n_matches:
+            self.form_tracker = FormTracker(n_matches)
+        return compute_recent_form(df, n_matches, tracker=self.form_tracker)
+
+    def read(self, path):
+        return read_typed_csv(path, self.SCHEMA)
 
     def load_and_process(self, path):
-        df = pd.read_csv(path)
+        df = self.read(path)
 
         df['home_rank_dif'] = df['home_rank'] - df['away_rank']
         df['away_rank_dif'] = -df['home_rank_dif']
@@ -276,17 +722,10 @@ class LiveMatchProcessor:
 
         df_team = self.convert_to_team_level_live(df)
 
-        fill_zero = [
-            'team_red_cards', 'team_yellow_cards', 'team_saves',
-            'opponent_red_cards', 'opponent_yellow_cards', 'opponent_saves',
-            'team_offsides', 'opponent_offsides',
-            'team_attempted_passes', 'opponent_attempted_passes'
-        ]
-        for col in fill_zero:
-            df_team[col] = df_team[col].fillna(0)
+        df_team = impute(df_team, zero_cols=self.zero_fill_cols)
 
         for col in ['team_possession', 'opponent_possession']:
-            df_team[col] = df_team[col].astype(str).str.replace('%', '', regex=False).astype(float)
+            df_team[col] = parse_percent(df_team[col])
 
         df_team['team_pass_accuracy'] = (df_team['team_successful_passes'] / df_team['team_attempted_passes']).fillna(0)
         df_team['opponent_pass_accuracy'] = (df_team['opponent_successful_passes'] / df_team['opponent_attempted_passes']).fillna(0)
@@ -304,11 +743,14 @@ class LiveMatchProcessor:
 
         df_team['team_form_win_rate'] = df_team.groupby('team_formation')['team_win'].transform('mean')
         df_team['opponent_form_win_rate'] = 1 - df_team.groupby('opponent_formation')['team_win'].transform('mean')
+        FormationIndex.from_frame(df_team).save("models/formation_index.pkl")
 
         df_team = self.compute_recent_form(df_team)
+        # Training rows are all home sides, then all away sides; live form needs the last matches in date order
+        FormTracker.from_fixtures(df_team).save("models/form_tracker.pkl")
         df_team = df_team[df_team["fixture_id"] != 1208324]
 
-        numeric = [col for col in df_team.columns if df_team[col].dtype in [np.float64, np.int64]]
+        numeric = [col for col in df_team.columns if pd.api.types.is_numeric_dtype(df_team[col])]
         df_team[numeric] = self.scaler.fit_transform(df_team[numeric])
         joblib.dump(self.scaler, "models/scaler.pkl")
 
@@ -317,29 +759,57 @@ class LiveMatchProcessor:
 
 
 class FatigueProcessor:
-    def __init__(self):
-        pass
+    VERSION = 1  # FeatureStore key; bump when the output changes
+    ZERO_FILL_COLS = [
+        'games_minutes', 'games_rating', 'shots_total', 'shots_on',
+        'goals_total', 'goals_assists', 'passes_total', 'passes_key',
+        'passes_accuracy', 'tackles_total', 'tackles_blocks',
+        'tackles_interceptions', 'duels_total', 'duels_won',
+        'dribbles_attempts', 'dribbles_success', 'fouls_drawn', 'fouls_committed'
+    ]
+
+    SCHEMA = {
+        'drop': [
+            'player_photo', 'offsides', 'goals_conceded', 'goals_saves',
+            'dribbles_past', 'penalty_won', 'penalty_committed', 'penalty_saved'
+        ],
+        'category': ['player_name', 'team_name', 'league', 'games_position'],
+        'float32': [col for col in ZERO_FILL_COLS if col not in ('games_rating', 'passes_accuracy')] + [
+            'games_number', 'cards_yellow', 'cards_red'],
+        'percent': ['passes_accuracy'],
+        'int32': ['player_id', 'fixture_id'],
+    }
+
+    ROLLING_FEATURES = [
+        'games_minutes', 'shots_total', 'shots_on', 'goals_total', 'goals_assists',
+        'passes_total', 'passes_key', 'passes_accuracy', 'tackles_total',
+        'tackles_blocks', 'tackles_interceptions', 'duels_total', 'duels_won',
+        'dribbles_attempts', 'dribbles_success', 'fouls_drawn', 'fouls_committed',
+        'cards_yellow', 'cards_red'
+    ]
+    DROPPED_COLS = [
+        'minutes', 'fatigue_score', 'passes_accuracy_avg5', 'accuracy_vs_group',
+        'duels_total_avg5', 'duels_per_min', 'passes_per_min',
+        'dribbles_attempts_avg5', 'dribbles_attempts'
+    ]
+    STATE_FEATURES = [
+        'passes_drop_ratio', 'duels_drop_ratio', 'accuracy_drop_ratio',
+        'passes_trend', 'duels_trend', 'accuracy_trend', 'passes_accuracy'
+    ]
+
+    def __init__(self, zero_fill_cols=None):
+        self.zero_fill_cols = self.ZERO_FILL_COLS if zero_fill_cols is None else zero_fill_cols
+
+    def read(self, path):
+        return read_typed_csv(path, self.SCHEMA)
 
     def load_and_process(self, path):
-        df = pd.read_csv(path)
+        df = self.read(path)
 
-        cols_to_drop = [
-            'player_photo', 'offsides', 'goals_conceded', 'goals_saves',
-            'dribbles_past', 'penalty_won', 'penalty_committed', 'penalty_saved'
-        ]
-        df.drop(columns=cols_to_drop, inplace=True, errors='ignore')
-
-        cols_fill_zero = [
-            'games_minutes', 'games_rating', 'shots_total', 'shots_on',
-            'goals_total', 'goals_assists', 'passes_total', 'passes_key',
-            'passes_accuracy', 'tackles_total', 'tackles_blocks',
-            'tackles_interceptions', 'duels_total', 'duels_won',
-            'dribbles_attempts', 'dribbles_success', 'fouls_drawn', 'fouls_committed'
-        ]
-        df[cols_fill_zero] = df[cols_fill_zero].fillna(0)
+        df = impute(df, zero_cols=self.zero_fill_cols)
         df = df.dropna(subset=['games_number'])
         df['games_rating'] = pd.to_numeric(df['games_rating'], errors='coerce')
-        df['passes_accuracy'] = df['passes_accuracy'].astype(str).str.replace('%', '', regex=False).astype(float) / 100
+        df['passes_accuracy'] = parse_percent(df['passes_accuracy']) / 100
 
         df['minutes'] = df['games_minutes'].replace(0, 1)
         df['passes_per_min'] = df['passes_total'] / df['minutes']
@@ -361,23 +831,16 @@ class FatigueProcessor:
             df['position'] = LabelEncoder().fit_transform(df['games_position'])
 
         df = df.sort_values(by=['player_id', 'fixture_id'])
-        rolling_features = [
-            'games_minutes', 'shots_total', 'shots_on', 'goals_total', 'goals_assists',
-            'passes_total', 'passes_key', 'passes_accuracy', 'tackles_total',
-            'tackles_blocks', 'tackles_interceptions', 'duels_total', 'duels_won',
-            'dribbles_attempts', 'dribbles_success', 'fouls_drawn', 'fouls_committed',
-            'cards_yellow', 'cards_red'
-        ]
-        for col in rolling_features:
-            df[f'{col}_avg5'] = df.groupby('player_id')[col].shift(1).rolling(window=5, min_periods=1).mean()
+        rolling_features = self.ROLLING_FEATURES
+        means = shifted_rolling_mean(df, rolling_features, ['player_id'], 5, per_group=False)
+        df[[f'{col}_avg5' for col in rolling_features]] = means.to_numpy()
         df = df.dropna(subset=[f'{col}_avg5' for col in rolling_features])
 
         df['passes_drop_ratio'] = df['passes_total'] / (df['passes_total_avg5'] + 1e-5)
         df['duels_drop_ratio'] = df['duels_total'] / (df['duels_total_avg5'] + 1e-5)
         df['accuracy_drop_ratio'] = df['passes_accuracy'] / (df['passes_accuracy_avg5'] + 1e-5)
-        df['passes_trend'] = df.groupby('player_id')['passes_total'].transform(lambda x: x.rolling(3, min_periods=1).apply(lambda s: s.iloc[-1] - s.iloc[0]))
-        df['duels_trend'] = df.groupby('player_id')['duels_total'].transform(lambda x: x.rolling(3, min_periods=1).apply(lambda s: s.iloc[-1] - s.iloc[0]))
-        df['accuracy_trend'] = df.groupby('player_id')['passes_accuracy'].transform(lambda x: x.rolling(3, min_periods=1).apply(lambda s: s.iloc[-1] - s.iloc[0]))
+        trends = grouped_window_diff(df, ['passes_total', 'duels_total', 'passes_accuracy'], ['player_id'], 3)
+        df[['passes_trend', 'duels_trend', 'accuracy_trend']] = trends.to_numpy()
 
         df['fatigue_score'] = (
             (df['passes_drop_ratio'] < 0.6).astype(int) +
@@ -397,18 +860,10 @@ class FatigueProcessor:
         )
         df['is_fatigued'] = ((df['fatigue_score'] + df['group_fatigue_score']) >= 3).astype(int)
 
-        cols_to_remove = [
-            'minutes', 'fatigue_score', 'passes_accuracy_avg5', 'accuracy_vs_group',
-            'duels_total_avg5', 'duels_per_min', 'passes_per_min',
-            'dribbles_attempts_avg5', 'dribbles_attempts'
-        ]
-        df.drop(columns=[col for col in cols_to_remove if col in df.columns], inplace=True)
+        df.drop(columns=[col for col in self.DROPPED_COLS if col in df.columns], inplace=True)
 
         features = [col for col in df.columns if col.endswith('_avg5')]
-        features += [
-            'passes_drop_ratio', 'duels_drop_ratio', 'accuracy_drop_ratio',
-            'passes_trend', 'duels_trend', 'accuracy_trend', 'passes_accuracy'
-        ]
+        features += self.STATE_FEATURES
         if 'position' in df.columns:
             features.append('position')
 
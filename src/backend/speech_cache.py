@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+
+CACHE_FOLDER = os.path.join("temp", "speech_cache")
+CACHE_MAX_BYTES = int(os.environ.get("SPEECH_CACHE_MAX_MB", 512)) * 1024 * 1024
+
+
+class SpeechCache:
+    """Content-addressed store of spoken replies: one folder per (text, voice, rhubarb options).
+
+    Each entry folder holds ``speech.wav`` and, once lipsync ran,
+    ``speech.json``. Files are written under a temporary name and renamed
+    into place, so readers never see a partial file. Reading an entry marks
+    it as recently used; the least recently used entries are deleted once
+    the cache grows past ``max_bytes``.
+    """
+
+    AUDIO = "speech.wav"
+    CUES = "speech.json"
+
+    def __init__(self, root=CACHE_FOLDER, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(text, voice, rhubarb_options=()):
+        payload = json.dumps([" ".join(text.split()), voice, list(rhubarb_options)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, key, name):
+        return os.path.join(self.root, key, name)
+
+    def entry_of(self, path):
+        """The cache key a file path belongs to, or None for files outside the cache."""
+        folder = os.path.dirname(os.path.abspath(path))
+        if os.path.dirname(folder) == os.path.abspath(self.root):
+            return os.path.basename(folder)
+        return None
+
+    def get(self, key, name):
+        """Path of a cached file, marking the entry as used, or None on a miss."""
+        path = self.path(key, name)
+        if not os.path.exists(path):
+            return None
+        try:
+            os.utime(os.path.dirname(path))
+        except FileNotFoundError:
+            return None
+        return path
+
+    @contextmanager
+    def writing(self, key, name):
+        """Yield a temporary path to write ``name`` into; if written, it is renamed into the entry on success."""
+        target = self.path(key, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        root, ext = os.path.splitext(target)
+        tmp = f"{root}.{uuid.uuid4().hex}.tmp{ext}"
+        try:
+            yield tmp
+            if os.path.exists(tmp):
+                os.replace(tmp, target)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.evict()
+
+    def put(self, key, name, data):
+        """Atomically store ``data`` (bytes) as ``name`` in the entry and return its path."""
+        with self.writing(key, name) as tmp:
+            with open(tmp, "wb") as f:
+                f.write(data)
+        return self.path(key, name)
+
+    def evict(self):
+        with self.lock:
+            entries = []
+            for key in os.listdir(self.root):
+                folder = os.path.join(self.root, key)
+                try:
+                    size = sum(entry.stat().st_size for entry in os.scandir(folder))
+                    entries.append((os.stat(folder).st_mtime, size, folder))
+                except (FileNotFoundError, NotADirectoryError):
+                    continue
+            total = sum(size for _, size, _ in entries)
+            for _, size, folder in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(folder, ignore_errors=True)
+                total -= size
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Backend modules import each other flat (``from visemes import ...``), as when app.py runs from src/backend
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.join(BACKEND, "models"))  # and so do the modules under models/
@@ -0,0 +1,37 @@
+import asyncio
+import time
+
+TICKS_PER_SECOND = 10_000_000
+
+
+class FakeCommunicate:
+    """Local stand-in for ``edge_tts.Communicate`` (7.x signature).
+
+    Streams one audio chunk per word, ``word_delay`` seconds apart, and
+    reports word boundaries only when asked with ``boundary="WordBoundary"``,
+    like the real service. Every ``stream`` call is logged in ``calls`` as
+    ``[text, start, end]`` (monotonic seconds).
+    """
+
+    calls = []
+    word_delay = 0.0
+
+    def __init__(self, text, voice="en-US-EmmaMultilingualNeural", *, boundary="SentenceBoundary", connector=None):
+        self.text = text
+        self.voice = voice
+        self.boundary = boundary
+
+    async def stream(self):
+        call = [self.text, time.monotonic(), None]
+        self.calls.append(call)
+        offset = 1_000_000
+        for word in self.text.split():
+            await asyncio.sleep(self.word_delay)
+            duration = 800_000 * len(word)
+            if self.boundary == "WordBoundary":
+                yield {"type": "WordBoundary", "offset": offset, "duration": duration, "text": word.strip(".,!?")}
+            yield {"type": "audio", "data": f"{self.text}|{word}|".encode()}
+            offset += duration + 500_000
+        if self.boundary == "SentenceBoundary":
+            yield {"type": "SentenceBoundary", "offset": 1_000_000, "duration": offset, "text": self.text}
+        call[2] = time.monotonic()
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+edge_tts = pytest.importorskip("edge_tts")
+
+import generate_tts
+from fake_edge_tts import FakeCommunicate
+
+
+@pytest.fixture
+def fake_tts(monkeypatch):
+    FakeCommunicate.calls = []
+    FakeCommunicate.word_delay = 0.0
+    monkeypatch.setattr(edge_tts, "Communicate", FakeCommunicate)
+    # A fresh loop inspects the fake's signature, as the real one does at startup
+    monkeypatch.setattr(generate_tts, "tts_loop", generate_tts.TTSLoop())
+    return FakeCommunicate
+
+
+def test_generate_tts_async_writes_cues_from_word_boundaries(fake_tts, tmp_path):
+    wav_path, cues_path = tmp_path / "speech.wav", tmp_path / "speech.json"
+
+    generate_tts.tts_loop.run(generate_tts.generate_tts_async(
+        "Press high, win the ball.", str(wav_path), cues_path=str(cues_path)))
+
+    assert wav_path.read_bytes().startswith(b"Press high, win the ball.|Press|")
+    cues = json.loads(cues_path.read_text())
+    assert cues["metadata"]["soundFile"] == "speech.wav"
+    mouth = cues["mouthCues"]
+    assert mouth[0] == {"start": 0.0, "end": 0.1, "value": "X"}
+    assert mouth[1]["value"] == "A"  # "Press" opens on closed lips
+    assert all(a["end"] <= b["start"] for a, b in zip(mouth, mouth[1:]))
+    assert {cue["value"] for cue in mouth} <= set("ABCDEFGHX")
+
+
+def test_without_word_boundaries_cues_are_left_to_rhubarb(fake_tts, tmp_path, monkeypatch):
+    class SentenceOnly(FakeCommunicate):
+        def __init__(self, text, voice="en-US-EmmaMultilingualNeural", **kwargs):
+            super().__init__(text, voice)  # an edge-tts that cannot be asked for word boundaries
+
+    monkeypatch.setattr(edge_tts, "Communicate", SentenceOnly)
+    cues_path = tmp_path / "speech.json"
+
+    generate_tts.tts_loop.run(generate_tts.generate_tts_async(
+        "Hold the line.", str(tmp_path / "speech.wav"), cues_path=str(cues_path)))
+
+    assert not cues_path.exists()
+
+
+SENTENCES = [
+    "The home side pressed high for the whole first half.",
+    "Their keeper kept them in it with three fine saves.",
+    "A late header from a corner finally won the match.",
+]
+
+
+def expected_chunks(sentences):
+    return [f"{sentence}|{word}|".encode() for sentence in sentences for word in sentence.split()]
+
+
+def test_stream_tts_yields_sentences_in_order_while_prefetching(fake_tts):
+    fake_tts.word_delay = 0.02
+
+    chunks = list(generate_tts.stream_tts(" ".join(SENTENCES)))
+
+    assert chunks == expected_chunks(SENTENCES)
+    calls = {text: (start, end) for text, start, end in fake_tts.calls}
+    assert list(calls) == SENTENCES
+    # Later sentences were being synthesized before the first one finished streaming
+    assert calls[SENTENCES[1]][0] < calls[SENTENCES[0]][1]
+    assert calls[SENTENCES[2]][0] < calls[SENTENCES[0]][1]
+
+
+def test_stream_tts_async_limits_prefetch(fake_tts):
+    fake_tts.word_delay = 0.01
+
+    async def collect():
+        return [chunk async for chunk in generate_tts.stream_tts_async(" ".join(SENTENCES), prefetch=1)]
+
+    assert generate_tts.tts_loop.run(collect()) == expected_chunks(SENTENCES)
+    calls = {text: (start, end) for text, start, end in fake_tts.calls}
+    assert calls[SENTENCES[1]][0] < calls[SENTENCES[0]][1]
+    # With one sentence prefetched, the third waits for the first to finish
+    assert calls[SENTENCES[2]][0] >= calls[SENTENCES[0]][1]
+
+
+def test_stream_tts_rejects_empty_text_before_streaming(fake_tts):
+    with pytest.raises(ValueError):
+        generate_tts.stream_tts("  \n ")
+    assert fake_tts.calls == []
@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+
+from process_module import LeagueTable, PreMatchProcessor, TeamHistory
+
+STATS = ['shots', 'shots_on_target', 'possession', 'goalkeeper_saves', 'yellow_cards', 'red_cards',
+         'corners', 'fouls', 'offsides', 'attempted_passes', 'successful_passes']
+FORMATIONS = ['4-3-3', '4-4-2', '4-2-3-1', None]
+IDENTITY_COLS = ['fixture_id', 'league', 'season', 'date', 'is_home', 'team_name', 'opponent_name',
+                 'team_formation', 'opponent_formation']
+
+
+def synthetic_matches(leagues=2, seasons=(2021, 2022), teams=6, seed=0):
+    """Round-robin-ish fixtures where each team plays at most once per date, with some stats missing."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    fixture_id = 1000
+    for league in range(leagues):
+        names = [f'L{league}_T{team}' for team in range(teams)]
+        for season in seasons:
+            for week in range(2 * teams):
+                order = rng.permutation(teams)
+                date = pd.Timestamp(f'{season}-08-01') + pd.Timedelta(days=7 * week + int(rng.integers(0, 2)))
+                for k in range(0, teams, 2):
+                    row = {
+                        'fixture_id': fixture_id, 'league': f'League{league}', 'season': season,
+                        'date': date.strftime('%Y-%m-%d'),
+                        'home_team': names[order[k]], 'away_team': names[order[k + 1]],
+                        'home_goals': int(rng.integers(0, 4)), 'away_goals': int(rng.integers(0, 4)),
+                        'home_formation': FORMATIONS[rng.integers(0, 4)], 'away_formation': FORMATIONS[rng.integers(0, 4)],
+                    }
+                    for side in ['home', 'away']:
+                        row[f'{side}_rank'] = float(rng.integers(1, teams + 1))
+                        row[f'{side}_points'] = float(rng.integers(0, 40))
+                        for stat in STATS:
+                            row[f'{side}_{stat}'] = float(rng.integers(0, 300 if 'passes' in stat else 15))
+                        row[f'{side}_possession'] = f'{int(rng.integers(30, 70))}%'
+                    rows.append(row)
+                    fixture_id += 1
+    df = pd.DataFrame(rows)
+    for col in ['home_rank', 'away_points', 'home_corners', 'away_offsides', 'home_attempted_passes']:
+        df.loc[rng.random(len(df)) < 0.1, col] = np.nan
+    return df
+
+
+@pytest.fixture
+def matches_csv(tmp_path):
+    path = tmp_path / 'matches.csv'
+    synthetic_matches().to_csv(path, index=False)
+    return str(path)
+
+
+def test_league_table_ranks_match_a_stable_sort():
+    rng = np.random.default_rng(1)
+    teams = [f'T{i}' for i in range(8)]
+    table = LeagueTable()
+    points = {}  # insertion order is the order teams first scored
+    for _ in range(60):
+        team, opponent = rng.choice(teams, 2, replace=False)
+        result = ['Win', 'Draw', 'Loss'][rng.integers(0, 3)]
+        table.apply(team, opponent, result)
+        gains = {'Win': [(team, 3)], 'Draw': [(team, 1), (opponent, 1)], 'Loss': [(opponent, 3)]}[result]
+        for side, gained in gains:
+            points[side] = points.get(side, 0) + gained
+
+        ranked = pd.Series(points).sort_values(ascending=False, kind='stable')
+        assert [table.rank(side) for side in ranked.index] == list(range(1, len(ranked) + 1))
+    assert all(np.isnan(table.rank(side)) for side in set(teams) - set(points))
+
+
+def test_parallel_build_matches_serial(matches_csv):
+    serial = PreMatchProcessor().load_and_process(matches_csv)
+    parallel = PreMatchProcessor(workers=2).load_and_process(matches_csv)
+    pd.testing.assert_frame_equal(serial, parallel, check_exact=True)
+
+
+def test_team_history_matches_the_batch_pipeline(matches_csv):
+    processor = PreMatchProcessor()
+    raw = processor.read(matches_csv)
+    fixture = raw.iloc[-1]
+    history = raw.iloc[:-1][pd.to_datetime(raw['date'].iloc[:-1]) < pd.Timestamp(fixture['date'])]
+
+    # The batch pipeline scoring the fixture appended to its history, without a result yet
+    upcoming = raw.iloc[[-1]][['fixture_id', 'league', 'season', 'date', 'home_team', 'away_team',
+                               'home_formation', 'away_formation']]
+    batch = processor.finalize(processor.build_base(pd.concat([history, upcoming], ignore_index=True)))
+    expected = (batch[batch['fixture_id'] == fixture['fixture_id']]
+                .sort_values('is_home', ascending=False).drop(columns='team_result').reset_index(drop=True))
+
+    got = TeamHistory(processor.build_base(history.copy()), processor.window).features(
+        fixture['home_team'], fixture['away_team'], fixture['date'], fixture['league'], fixture['season'],
+        fixture['home_formation'], fixture['away_formation'], fixture_id=fixture['fixture_id'])
+
+    assert list(got.columns) == list(expected.columns)
+    for col in expected.columns:
+        if col in IDENTITY_COLS:
+            assert [str(value) for value in got[col]] == [str(value) for value in expected[col]], col
+        else:
+            np.testing.assert_allclose(got[col].to_numpy(dtype=float), expected[col].to_numpy(dtype=float),
+                                       rtol=1e-12, err_msg=col)
+
+
+def test_feature_store_append_matches_full_rebuild(tmp_path):
+    pytest.importorskip("pyarrow")
+    from feature_store import FeatureStore
+
+    matches = synthetic_matches()
+    # The appended rows add a new league and a new team, so the categories change too
+    extra = synthetic_matches(leagues=1, seasons=(2022,), seed=5).assign(
+        league='New League', fixture_id=lambda df: df['fixture_id'] + 10_000)
+    extra.loc[extra.index % 3 == 0, 'home_team'] = 'Brand New FC'
+    path = tmp_path / 'matches.csv'
+    store = FeatureStore(str(tmp_path / 'store'))
+
+    matches.to_csv(path, index=False)
+    store.load_or_process(PreMatchProcessor(), str(path))
+    pd.concat([matches, extra], ignore_index=True).to_csv(path, index=False)
+    spliced = store.load_or_process(PreMatchProcessor(), str(path))
+
+    pd.testing.assert_frame_equal(spliced, PreMatchProcessor().load_and_process(str(path)), check_exact=True)
+    pd.testing.assert_frame_equal(store.load_or_process(PreMatchProcessor(), str(path)), spliced, check_exact=True)
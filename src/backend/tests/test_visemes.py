@@ -0,0 +1,20 @@
+from visemes import cues_from_word_boundaries, word_to_visemes
+
+
+def test_word_to_visemes():
+    assert word_to_visemes("ball") == ["A", "D", "H"]
+    assert word_to_visemes("Messi") == ["A", "C", "B", "C"]
+    assert word_to_visemes("phone") == ["G", "E", "B"]
+    assert word_to_visemes("2024") == ["B", "C"]
+    assert word_to_visemes("—") == []
+
+
+def test_pauses_close_the_mouth():
+    boundaries = [
+        {"offset": 0, "duration": 3_000_000, "text": "Go"},
+        {"offset": 8_000_000, "duration": 3_000_000, "text": "on"},
+    ]
+    cues = cues_from_word_boundaries(boundaries, duration=1.5)["mouthCues"]
+    assert [cue["value"] for cue in cues] == ["B", "E", "X", "E", "B", "X"]
+    assert cues[2] == {"start": 0.3, "end": 0.8, "value": "X"}
+    assert cues[-1]["end"] == 1.5
@@ -1,40 +1,203 @@
 import os
-import subprocess
-from transformers import pipeline
+import queue
+import threading
+import time
+from concurrent.futures import Future
 
-# Initialize the ASR pipeline
-asr = pipeline("automatic-speech-recognition", model="facebook/wav2vec2-large-960h")
+import numpy as np
 
-def transcribe_audio(audio_path):
-    print(f"🔍 Converting file: {audio_path}")
-    wav_path = audio_path.replace(".webm", ".wav")
+from audio_io import decode_audio
 
+ASR_MODEL = "facebook/wav2vec2-large-960h"
+ASR_SAMPLE_RATE = 16000
+ASR_MAX_BATCH = int(os.environ.get("ASR_MAX_BATCH", 8))
+ASR_MAX_WAIT = float(os.environ.get("ASR_MAX_WAIT_MS", 50)) / 1000
+
+# Recordings longer than this are transcribed in chunks cut at silences
+CHUNK_MAX_S = float(os.environ.get("ASR_CHUNK_MAX_S", 20))
+CHUNK_MIN_S = 5
+CHUNK_OVERLAP_S = 1  # stride shared by chunks that had to be cut mid-speech
+FRAME_S = 0.02
+SILENCE_DB = -35  # frames this far below the loudest frame count as silence
+MIN_SILENCE_S = 0.2
+
+_asr = None
+_asr_lock = threading.Lock()
+
+
+def get_asr():
+    """The ASR pipeline, loaded on first use and shared by every thread of the process."""
+    global _asr
+    if _asr is None:
+        with _asr_lock:
+            if _asr is None:
+                from transformers import pipeline
+                print(f"🔍 Loading ASR model: {ASR_MODEL}")
+                _asr = pipeline("automatic-speech-recognition", model=ASR_MODEL)
+                print("✅ ASR model loaded")
+    return _asr
+
+
+def warm_up():
+    """Load the model and run one forward pass so the first request does not pay for it."""
+    get_asr()({"raw": np.zeros(ASR_SAMPLE_RATE, dtype=np.float32), "sampling_rate": ASR_SAMPLE_RATE})
+
+
+class ASRBatcher:
+    """Collects concurrent transcription requests into batched forward passes.
+
+    A request waits at most ``max_wait`` seconds for others to join it; a
+    batch never exceeds ``max_batch_size`` inputs.
+    """
+
+    def __init__(self, max_batch_size=ASR_MAX_BATCH, max_wait=ASR_MAX_WAIT):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, audio):
+        """Queue one input (a ``{"raw", "sampling_rate"}`` dict or path) and return a Future of its result."""
+        future = Future()
+        self.requests.put((audio, future))
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._loop, name="asr-batcher", daemon=True)
+                self.thread.start()
+        return future
+
+    def __call__(self, audio):
+        return self.submit(audio).result()
+
+    def _loop(self):
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._run(batch)
+
+    def _run(self, batch):
+        inputs = [audio for audio, _ in batch]
+        try:
+            results = get_asr()(inputs, batch_size=len(inputs))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+batcher = ASRBatcher()
+
+
+def find_chunks(samples, sample_rate=ASR_SAMPLE_RATE, max_s=CHUNK_MAX_S, min_s=CHUNK_MIN_S,
+                overlap_s=CHUNK_OVERLAP_S):
+    """Split a recording into ``(start, end, overlapped)`` sample ranges of at most ``max_s`` seconds.
+
+    Each chunk ends in the middle of the longest silence (by frame energy)
+    between ``min_s`` and ``max_s`` into it. Where there is none, the chunk
+    is cut at ``max_s`` and the next one starts ``overlap_s`` earlier, with
+    ``overlapped`` set so the texts are merged on their shared words.
+    """
+    frame = int(FRAME_S * sample_rate)
+    n_frames = len(samples) // frame
+    if n_frames == 0 or len(samples) <= max_s * sample_rate:
+        return [(0, len(samples), False)]
+
+    rms = np.sqrt(np.mean(samples[:n_frames * frame].reshape(n_frames, frame) ** 2, axis=1))
+    silent = rms < rms.max() * 10 ** (SILENCE_DB / 20)
+    # Length of the silent run ending at each frame
+    run = np.zeros(n_frames, dtype=int)
+    for i in np.flatnonzero(silent):
+        run[i] = run[i - 1] + 1 if i else 1
+
+    max_frames, min_frames = int(max_s / FRAME_S), int(min_s / FRAME_S)
+    min_silence = int(MIN_SILENCE_S / FRAME_S)
+    chunks, start, overlapped = [], 0, False
+    while n_frames - start > max_frames:
+        window = run[start + min_frames:start + max_frames]
+        best = int(window.argmax()) if len(window) else 0
+        if len(window) and window[best] >= min_silence:
+            end = max(start + min_frames + best - window[best] // 2, start + 1)
+            chunks.append((start * frame, end * frame, overlapped))
+            start, overlapped = end, False
+        else:
+            end = start + max_frames
+            chunks.append((start * frame, end * frame, overlapped))
+            start, overlapped = end - int(overlap_s / FRAME_S), True
+    chunks.append((start * frame, len(samples), overlapped))
+    return chunks
+
+
+def merge_text(text, addition, overlapped, max_words=8):
+    """Append a chunk's text, dropping the words it repeats from an overlapped stride."""
+    if not overlapped:
+        return f"{text} {addition}".strip()
+    words, new = text.split(), addition.split()
+    for n in range(min(max_words, len(words), len(new)), 0, -1):
+        if words[-n:] == new[:n]:
+            new = new[n:]
+            break
+    return " ".join(words + new)
+
+
+def iter_transcription(samples, sample_rate=ASR_SAMPLE_RATE):
+    """Yield the transcript so far after each chunk of ``samples``.
+
+    Chunks are queued on the batcher at most ``ASR_MAX_BATCH`` at a time, so
+    memory stays bounded by the chunk size, not the recording length.
+    """
+    chunks = find_chunks(samples, sample_rate)
+    pending = []
+    text = ""
+    for i, (start, end, overlapped) in enumerate(chunks):
+        pending.append((batcher.submit({"raw": samples[start:end], "sampling_rate": sample_rate}), overlapped))
+        if len(pending) == batcher.max_batch_size or i == len(chunks) - 1:
+            for future, was_overlapped in pending:
+                text = merge_text(text, future.result()["text"], was_overlapped)
+                yield text
+            pending = []
+
+
+def transcribe_audio(audio, on_partial=None):
+    """Transcribe an upload given as a path or raw bytes; it is decoded in memory, never written to disk.
+
+    Long recordings are transcribed chunk by chunk; ``on_partial`` is called
+    with the cleaned transcript so far after every chunk.
+    """
     try:
-        # Convert to WAV with 16kHz mono using ffmpeg
-        subprocess.run([
-            "bin/ffmpeg.exe", "-y", "-i", audio_path,
-            "-ar", "16000", "-ac", "1", wav_path
-        ], check=True)
-        print("✅ Audio successfully converted to WAV:", wav_path)
+        # Decode to 16kHz mono float32 through an ffmpeg pipe
+        samples = decode_audio(audio, ASR_SAMPLE_RATE)
+        print(f"✅ Audio decoded: {len(samples) / ASR_SAMPLE_RATE:.1f}s")
     except Exception as e:
-        print("❌ Failed to convert to WAV:", e)
+        print("❌ Failed to decode audio:", e)
         raise e
 
     try:
-        # Run transcription
-        result = asr(wav_path)
-        raw_text = result["text"]
+        # Run transcription, batched with any concurrent requests
+        raw_text = ""
+        for raw_text in iter_transcription(samples):
+            if on_partial:
+                on_partial(clean_text(raw_text))
         print("✅ Raw transcription:", raw_text)
 
-        cleaned_text = raw_text.lower().strip().capitalize()
+        cleaned_text = clean_text(raw_text)
         print("✅ Cleaned transcription:", cleaned_text)
 
         return cleaned_text
     except Exception as e:
         print("❌ Transcription failed:", e)
         raise e
-    finally:
-        try:
-            os.remove(wav_path)
-        except:
-            pass
+
+
+def clean_text(raw_text):
+    return raw_text.lower().strip().capitalize()
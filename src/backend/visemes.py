@@ -0,0 +1,90 @@
+import re
+
+# Rhubarb mouth shapes: A closed (P B M), B clenched (most consonants, EE),
+# C open (EH AE), D wide open (AA), E rounded (AO ER), F puckered (UW OW W),
+# G teeth on lip (F V), H tongue up (L), X idle.
+GRAPHEMES = [
+    ("tch", "B"), ("igh", "C"), ("ough", "E"),
+    ("th", "B"), ("sh", "B"), ("ch", "B"), ("ph", "G"), ("wh", "F"), ("qu", "BF"), ("ck", "B"), ("ng", "B"),
+    ("gh", ""),
+    ("ee", "B"), ("ea", "B"), ("ie", "B"), ("ey", "B"),
+    ("oo", "F"), ("ou", "F"), ("ew", "F"), ("ue", "F"), ("oa", "F"), ("ow", "F"),
+    ("aw", "E"), ("au", "E"), ("or", "E"), ("er", "E"), ("ir", "E"), ("ur", "E"), ("oi", "E"), ("oy", "E"),
+    ("ai", "C"), ("ay", "C"),
+    ("a", "D"), ("e", "C"), ("i", "C"), ("o", "E"), ("u", "F"), ("y", "B"),
+    ("m", "A"), ("b", "A"), ("p", "A"),
+    ("f", "G"), ("v", "G"),
+    ("w", "F"),
+    ("l", "H"),
+]
+VOWEL_SHAPES = set("CDEF")
+WORD_GAP_S = 0.08  # pauses between words longer than this close the mouth
+TICKS_PER_SECOND = 10_000_000  # edge-tts offsets are in 100 ns ticks
+
+
+def word_to_visemes(word):
+    """Rhubarb mouth shapes for one written word, e.g. ``"ball"`` -> ``["A", "D", "H"]``."""
+    letters = re.sub(r"[^a-z]", "", word.lower())
+    if len(letters) > 3 and letters.endswith("e") and letters[-2] not in "aeiouy":
+        letters = letters[:-1]  # silent final e
+    letters = re.sub(r"([^aeiou])\1", r"\1", letters)  # doubled consonants ("ll", "ss") are one sound
+    if not letters:
+        return ["B", "C"] if re.search(r"\w", word) else []
+
+    shapes = []
+    i = 0
+    while i < len(letters):
+        for grapheme, grapheme_shapes in GRAPHEMES:
+            if letters.startswith(grapheme, i):
+                shapes.extend(grapheme_shapes)
+                i += len(grapheme)
+                break
+        else:
+            shapes.append("B")
+            i += 1
+    return shapes
+
+
+def _append(cues, start, end, value):
+    if end - start <= 0:
+        return
+    if cues and cues[-1]["value"] == value and abs(cues[-1]["end"] - start) < 1e-9:
+        cues[-1]["end"] = end
+    else:
+        cues.append({"start": start, "end": end, "value": value})
+
+
+def cues_from_word_boundaries(boundaries, duration=None, sound_file=""):
+    """Rhubarb-style ``{"metadata", "mouthCues"}`` from edge-tts ``WordBoundary`` events.
+
+    Each word's span is shared among its mouth shapes, vowels getting twice
+    a consonant's time. Silences before, between and after words become X.
+    """
+    cues = []
+    position = 0.0
+    for boundary in boundaries:
+        start = boundary["offset"] / TICKS_PER_SECOND
+        end = start + boundary["duration"] / TICKS_PER_SECOND
+        shapes = word_to_visemes(boundary["text"])
+        if not shapes:
+            continue
+        if start - position > WORD_GAP_S or not cues:
+            _append(cues, position, start, "X")
+        else:
+            start = position
+        weights = [2 if shape in VOWEL_SHAPES else 1 for shape in shapes]
+        step = (end - start) / sum(weights)
+        for shape, weight in zip(shapes, weights):
+            _append(cues, start, start + step * weight, shape)
+            start += step * weight
+        position = end
+
+    duration = max(duration or 0.0, position)
+    _append(cues, position, duration, "X")
+    if not cues:
+        cues.append({"start": 0.0, "end": duration, "value": "X"})
+    for cue in cues:
+        cue["start"] = round(cue["start"], 2)
+        cue["end"] = round(cue["end"], 2)
+    cues = [cue for cue in cues if cue["end"] > cue["start"]] or cues[-1:]
+    return {"metadata": {"soundFile": sound_file, "duration": round(duration, 2)}, "mouthCues": cues}